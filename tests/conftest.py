@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the plugin is a single module at the top of the repo rather than an installed package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# and the offline tools (HeadlessBot, the simulator, the stress test) live next to it, out of the plugins dir's reach
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
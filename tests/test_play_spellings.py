@@ -0,0 +1,82 @@
+"""
+PLAY_SPELLINGS against the play command parser it replaced.
+"""
+import itertools
+import re
+
+import unobot
+from unobot import CARD_COLORS, COLORED_CARD_NUMS, PLAY_SPELLINGS, SPECIAL_CARDS
+
+# what the unoplayshort rule matches (Sopel compiles rules case-insensitively)
+SHORT_FORM = re.compile(r'^[rgbyw][0-9rgbyds]{1,3}$', re.IGNORECASE)
+
+
+def old_parse(spelling):
+    """
+    UnoGame.play's parsing before PLAY_SPELLINGS: `spelling` is (arg1, arg2) for `.play arg1 arg2` or the whole
+    message for a short form. Returns (card to look for, card as played, colour), or None for the syntax help.
+    """
+    try:
+        if isinstance(spelling, tuple):
+            color, card = spelling[0].upper(), spelling[1].upper()  # AttributeError if either is missing
+        elif spelling.upper()[0] != 'W':
+            color, card = spelling[:1].upper(), spelling[1:].upper()
+        else:
+            color, card = spelling[:-1].upper(), spelling[-1:].upper()
+        if color not in CARD_COLORS:
+            color, card = card, color
+        elif card not in (COLORED_CARD_NUMS + SPECIAL_CARDS):
+            color, card = card, color
+        if color in CARD_COLORS and card in (COLORED_CARD_NUMS + SPECIAL_CARDS):
+            return (card if card in SPECIAL_CARDS else color + card), color + card, color
+    except AttributeError:
+        pass
+    return None
+
+
+def new_parse(spelling):
+    if isinstance(spelling, tuple):
+        spelling = tuple((arg or '').upper() for arg in spelling)
+    else:
+        spelling = spelling.upper()
+    return PLAY_SPELLINGS.get(spelling)
+
+
+def check(spellings):
+    checked = 0
+    for spelling in spellings:
+        old = old_parse(spelling)
+        if old is not None and old[2] not in tuple(CARD_COLORS):
+            # the old `color in 'RGBY'` test let substrings like '' or 'RG' pass as colours, e.g. `.play w rg`
+            # played a wild as 'RGW'; those get the syntax help now
+            assert new_parse(spelling) is None, spelling
+        else:
+            assert new_parse(spelling) == (old and old[:2]), spelling
+        checked += 1
+    return checked
+
+
+def test_two_argument_pairs_match_old_parser():
+    alphabet = 'RGBYWDS0123456789x'
+    tokens = [None, '', 'RG', 'RGB', 'RGBY', 'WD4', 'D2R', 'W4']
+    tokens += [''.join(chars) for n in (1, 2) for chars in itertools.product(alphabet, repeat=n)]
+    tokens += [token.lower() for token in tokens if token]
+    assert check(itertools.product(tokens, repeat=2)) == len(tokens) ** 2
+
+
+def test_short_forms_match_old_parser():
+    rest = '0123456789rgbyds'
+    spellings = [first + ''.join(chars) for first in 'rgbyw' for n in (1, 2, 3)
+                 for chars in itertools.product(rest, repeat=n)]
+    spellings += [spelling.upper() for spelling in spellings]
+    assert all(SHORT_FORM.match(spelling) for spelling in spellings)
+    assert check(spellings) == len(spellings)
+
+
+def test_every_card_can_be_played():
+    played = set(playcard for searchcard, playcard in PLAY_SPELLINGS.values())
+    for card in set(unobot.FULL_DECK):
+        if card in SPECIAL_CARDS:
+            assert all(color + card in played for color in CARD_COLORS)
+        else:
+            assert card in played
@@ -0,0 +1,91 @@
+"""
+Cached .unotop/.unorank output must always be what rendering from scratch would give.
+"""
+import random
+
+import unobot
+from unobot import BotTrigger, STRINGS
+from unotools import HeadlessBot
+
+NICKS = ['n%d' % n for n in range(30)]
+# every spelling of two channels, so cache entries and boards are shared between them
+CHANNELS = ['#a', '#A', '#Uno', '#uno', '#UNO']
+
+
+class RecordingBot(HeadlessBot):
+    def __init__(self, *args, **kwargs):
+        super(RecordingBot, self).__init__(*args, **kwargs)
+        self.said = []
+
+    def _send(self, kind, message, destination):
+        self.said.append(message)
+
+
+def test_cached_rankings_match_fresh_renders(tmp_path):
+    scorefile = str(tmp_path / 'unoscores.txt')
+    unobot.write_score_file(scorefile, [])
+    uno = unobot.UnoBot(scorefile, None, str(tmp_path / 'unoboards.json'))
+    bot = RecordingBot(homedir=str(tmp_path))
+    rng = random.Random(0)
+    checked = 0
+    try:
+        for step in range(1500):
+            if rng.random() < 0.15:
+                players = rng.sample(NICKS, rng.randint(2, 4))
+                uno.update_scores(bot, players, rng.choice(players), rng.choice([0, 1, 20, 50]), rng.randint(0, 500),
+                                  rng.choice(CHANNELS + [None]))
+                continue
+            window = rng.choice(['all', 'daily', 'weekly'])
+            channel = rng.choice(CHANNELS + [None])
+            toplist = rng.random() < 0.5
+            player = None if toplist else rng.choice(NICKS)
+            args = [arg for arg in (window, channel, player) if arg]
+            del bot.said[:]
+            uno.rankings(bot, BotTrigger('n0', '#a', args), toplist)
+            fresh = uno.render_rankings(bot, window, channel and unobot.tools.Identifier(channel), player, toplist)
+            assert bot.said == (fresh[0] if fresh else [STRINGS['NO_SCORES']]), (step, args)
+            checked += 1
+    finally:
+        uno.close()
+    assert uno.renderCache.hits > checked // 4
+
+
+def test_channel_spellings_share_a_board(tmp_path):
+    scorefile = str(tmp_path / 'unoscores.txt')
+    unobot.write_score_file(scorefile, [])
+    uno = unobot.UnoBot(scorefile, None, str(tmp_path / 'unoboards.json'))
+    bot = RecordingBot(homedir=str(tmp_path))
+    try:
+        uno.update_scores(bot, ['alice', 'bob'], 'alice', 10, 60, '#Uno')
+        uno.update_scores(bot, ['alice', 'bob'], 'bob', 5, 60, '#uno')
+        uno.rankings(bot, BotTrigger('alice', '#uno', ['#UNO']), True)
+        cached = list(bot.said)
+        del bot.said[:]
+        uno.renderCache.clear()
+        uno.rankings(bot, BotTrigger('alice', '#uno', ['#uNo']), True)
+    finally:
+        uno.close()
+    assert bot.said == cached
+    assert cached[0] == STRINGS['BOARD_TOP'] % 'in #uno'
+    assert '2 games' in cached[1] and '2 games' in cached[2]
+
+
+def test_unotop_ignores_a_nick(tmp_path):
+    scorefile = str(tmp_path / 'unoscores.txt')
+    unobot.write_score_file(scorefile, [])
+    uno = unobot.UnoBot(scorefile, None, str(tmp_path / 'unoboards.json'))
+    bot = RecordingBot(homedir=str(tmp_path))
+    try:
+        uno.update_scores(bot, ['alice', 'bob'], 'alice', 10, 60, '#uno')
+        uno.rankings(bot, BotTrigger('alice', '#uno', ['bob']), True)
+        uno.rankings(bot, BotTrigger('alice', '#uno', ['10']), True)
+        del bot.said[:]
+        uno.rankings(bot, BotTrigger('alice', '#uno', []), True)
+        top = list(bot.said)
+        uno.update_scores(bot, ['alice', 'bob'], 'bob', 5, 60, '#uno')  # invalidates the cached list
+        del bot.said[:]
+        uno.rankings(bot, BotTrigger('alice', '#uno', []), True)
+    finally:
+        uno.close()
+    assert len(top) == 1 and top[0].startswith('#1 alice ')
+    assert len(bot.said) == 2 and bot.said[1].startswith('#2 bob ')
@@ -0,0 +1,73 @@
+"""
+Several bot processes sharing one homedir must not lose each other's score updates.
+"""
+import multiprocessing
+import threading
+import time
+
+import unobot
+import unotools
+
+PROCESSES = 4
+GAMES = 25
+
+
+def _record_games(job):
+    scorefile, boardfile, worker, games = job
+    bot = unotools.HeadlessBot()
+    uno = unobot.UnoBot(scorefile, None, boardfile)
+    for n in range(games):
+        players = ['shared', 'proc%d' % worker]
+        uno.update_scores(bot, players, players[n % 2], 1, 1, '#chan%d' % (worker % 2))
+    uno.close()
+
+
+def test_concurrent_processes_lose_no_updates(tmp_path):
+    scorefile = str(tmp_path / 'unoscores.txt')
+    boardfile = str(tmp_path / 'unoboards.json')
+    unobot.write_score_file(scorefile, [])
+    pool = multiprocessing.Pool(PROCESSES)
+    try:
+        pool.map(_record_games, [(scorefile, boardfile, n, GAMES) for n in range(PROCESSES)])
+    finally:
+        pool.close()
+        pool.join()
+
+    expected = PROCESSES * GAMES
+    scores = dict(unobot.iter_score_file(scorefile))
+    assert scores['shared'].games == expected
+    assert sum(record.points for record in scores.values()) == expected
+    boards = unobot.Leaderboards(boardfile)
+    assert boards.table('daily')['shared'].games == expected
+    assert sum(boards.table('all', '#chan%d' % c)['shared'].games for c in range(2)) == expected
+
+
+def test_results_the_writer_cannot_reach_are_kept_for_next_start(tmp_path, monkeypatch):
+    scorefile = str(tmp_path / 'unoscores.txt')
+    unobot.write_score_file(scorefile, [])
+    monkeypatch.setattr(unobot.ScoreWriter, 'QUEUE_SIZE', 2)
+    monkeypatch.setattr(unobot.ScoreWriter, 'SUBMIT_TIMEOUT', 0.1)
+    monkeypatch.setattr(unobot.ScoreWriter, 'CLOSE_TIMEOUT', 0.1)
+    bot = unotools.HeadlessBot()
+    uno = unobot.UnoBot(scorefile)
+    stuck = threading.Event()
+    update_scores = uno.update_scores
+    uno.update_scores = lambda *args: stuck.wait() and update_scores(*args)
+    accepted = [uno.scoreWriter.submit(bot, ['a', 'b'], 'a', 1, 1, None) for n in range(5)]
+    uno.close()
+    # one is being applied, two are queued and two didn't fit; everything but the one in hand is saved
+    assert accepted.count(False) == 2
+    stuck.set()
+    for n in range(100):
+        if 'a' in dict(unobot.iter_score_file(scorefile)):
+            break
+        time.sleep(0.05)
+
+    uno = unobot.UnoBot(scorefile)
+    try:
+        assert uno.scoreWriter.resume(bot) == 4
+        assert uno.scoreWriter.resume(bot) == 0
+    finally:
+        uno.close()
+    scores = dict(unobot.iter_score_file(scorefile))
+    assert scores['a'].games == 5 and scores['a'].points == 5
@@ -0,0 +1,12 @@
+"""
+Game state must stay consistent while every UNO command is called from many threads at once.
+"""
+import pytest
+
+import unotools
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_concurrent_commands_keep_invariants(seed):
+    # short and seeded, so a failure can be rerun with `python tools/unotools.py stress-games --seed N`
+    assert unotools.stress_games(threads=8, ops=500, seed=seed)
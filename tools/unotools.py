@@ -0,0 +1,491 @@
+"""
+UnoBot tools that run without a Sopel instance: score file export, import and conversion, analytics, replaying game
+logs, benchmarks, self-play for the built-in AI and the concurrency stress test. See `python tools/unotools.py -h`.
+
+This file is covered under the project license, located in LICENSE.md
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+from timeit import default_timer as timer
+
+# the plugin is a single module in the directory above rather than an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sopel.tools as tools  # noqa: E402
+
+from unobot import (  # noqa: E402
+    AI_MOVE_BUDGET, FULL_DECK, HAND_DELTA, HAND_FULL, HAND_MODE_NAMES, NO, WIN, YES, BotTrigger, Histogram,
+    ScoreAnalytics, UnoAI, UnoBot, UnoGame, iter_game_history, iter_legacy_score_file, iter_score_export, lock,
+    merge_score_entries, numpy, read_game_log, write_score_export, write_score_file,
+)
+
+# niceties for Python 2 / 3 compatibility
+if sys.version_info.major < 3:
+    range = xrange
+    str = unicode
+
+
+class HeadlessBot(object):
+    """
+    Just enough of Sopel's bot interface for games to run without an IRC connection.
+    """
+    class _Section(object):
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+    class _DB(object):
+        def __init__(self):
+            self.values = {}
+
+        def get_nick_value(self, nick, key):
+            return self.values.get((tools.Identifier(nick), key))
+
+        def set_nick_value(self, nick, key, value):
+            self.values[(tools.Identifier(nick), key)] = value
+
+    def __init__(self, homedir='.', nick='UnoBot', echo=NO):
+        self.nick = tools.Identifier(nick)
+        self.config = self._Section(core=self._Section(homedir=homedir, help_prefix='.'))
+        self.db = self._DB()
+        self.memory = {}
+        self.privileges = {}
+        self.echo = echo
+        self.lines = 0
+        self.bytes = 0
+        self.bytes_by_kind = {'PRIVMSG': 0, 'NOTICE': 0}
+
+    def _send(self, kind, message, destination):
+        self.lines += 1
+        self.bytes += len(message)
+        self.bytes_by_kind[kind] += len(message)
+        if self.echo:
+            print('%s %s: %s' % (kind, destination, message))
+
+    def say(self, message, destination=None):
+        self._send('PRIVMSG', message, destination)
+
+    def msg(self, destination, message):
+        self._send('PRIVMSG', message, destination)
+
+    def notice(self, message, destination=None):
+        self._send('NOTICE', message, destination)
+
+    def reply(self, message):
+        self._send('PRIVMSG', message, None)
+
+
+class HeadlessNickTrigger(str):
+    """
+    A NICK event trigger: the trigger itself is the new nick, and `nick` is the old one.
+    """
+    def __new__(cls, old, new):
+        self = str.__new__(cls, new)
+        self.nick = tools.Identifier(old)
+        return self
+
+
+def replay_game(events, bot=None):
+    """
+    Rebuild an UnoGame by running a recorded event stream back through the game logic. Stops at the end of the
+    stream or at the winning play, whichever comes first.
+    """
+    events = list(events)
+    bot = bot or HeadlessBot()
+    start = events[0]
+    channel = start['channel']
+    seed = next((e['seed'] for e in events if e['ev'] == 'deal'), None)
+    game = UnoGame(BotTrigger(start['owner'], channel), seed=seed)
+    for event in events[1:]:
+        kind = event['ev']
+        if kind == 'join':
+            game.join(bot, BotTrigger(event['nick'], channel))
+        elif kind == 'deal':
+            game.deal(bot, BotTrigger(event['by'], channel, admin=YES))
+        elif kind == 'play':
+            card = event['card']
+            if game.play(bot, BotTrigger(event['nick'], channel, [card[0], card[1:]])) == WIN:
+                break
+        elif kind == 'draw':
+            game.draw(bot, BotTrigger(event['nick'], channel))
+        elif kind == 'pass':
+            game.pass_(bot, BotTrigger(event['nick'], channel))
+        elif kind == 'quit':
+            game.quit(bot, BotTrigger(event['nick'], channel))
+        elif kind == 'kick':
+            game.kick(bot, BotTrigger(event['by'], channel, [event['nick']], admin=YES))
+        elif kind == 'nick':
+            game.nick_change(bot, HeadlessNickTrigger(event['old'], event['new']))
+        elif kind == 'move':
+            game.game_moved(bot, event['by'], channel, tools.Identifier(event['channel']))
+            channel = event['channel']
+    return game
+
+
+def bench_memory(games=1000, ranked=10000):
+    import tempfile
+    import tracemalloc
+
+    bot = HeadlessBot()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    table = []
+    for n in range(games):
+        channel = '#uno%d' % n
+        game = UnoGame(BotTrigger('alice', channel))
+        for nick in ('bob', 'carol', 'dave'):
+            game.join(bot, BotTrigger(nick, channel))
+        game.deal(bot, BotTrigger('alice', channel))
+        table.append(game)
+    after = tracemalloc.take_snapshot()
+    per_game = sum(stat.size_diff for stat in after.compare_to(before, 'filename')) / float(games)
+    del table
+
+    scorefile = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+    json.dump(dict(('player%d' % n, {'games': n % 50 + 1, 'wins': n % 7, 'points': n * 3, 'playtime': n * 60})
+                   for n in range(ranked)), scorefile)
+    scorefile.close()
+    try:
+        before = tracemalloc.take_snapshot()
+        scores = UnoBot(scorefile.name).get_scores(bot)
+        after = tracemalloc.take_snapshot()
+        per_player = sum(stat.size_diff for stat in after.compare_to(before, 'filename')) / float(len(scores))
+    finally:
+        os.remove(scorefile.name)
+    tracemalloc.stop()
+    print('%d dealt 4-player games: %.0f bytes per game' % (games, per_game))
+    print('%d ranked players: %.0f bytes per ranked player' % (ranked, per_player))
+
+
+def simulate_game(unobot, bot, channel, nicks, seed, choose=None, max_turns=2000):
+    """
+    Play one whole game through the normal UnoBot entry points. `choose(game, plays)` picks a move from
+    UnoGame.legal_plays() (at random by default); players with nothing to play draw, then pass if they still can't.
+    Returns the number of turns taken and the winner (None if the game was stopped at `max_turns`).
+    """
+    rng = random.Random(seed)
+    choose = choose or (lambda game, plays: rng.choice(plays))
+    unobot.start(bot, BotTrigger(nicks[0], channel))
+    game = unobot.games[channel]
+    game.seed = seed
+    for nick in nicks[1:]:
+        unobot.join(bot, BotTrigger(nick, channel))
+    unobot.deal(bot, BotTrigger(nicks[0], channel))
+    turns = 0
+    while unobot.games.get(channel) is game:
+        if turns == max_turns:
+            unobot.stop(bot, BotTrigger(nicks[0], channel), forced=YES)
+            break
+        nick = game.playerOrder[game.currentPlayer]
+        plays = game.legal_plays()
+        if plays:
+            searchcard, playcard = choose(game, plays)
+            unobot.play(bot, BotTrigger(nick, channel, [playcard[0], playcard[1:]]))
+        else:
+            unobot.fml(bot, BotTrigger(nick, channel))
+        turns += 1
+    return turns, next((nick for nick in game.playerOrder if not game.players[nick]), None)
+
+
+def bench_output(games=200, players=4):
+    """
+    Play the same seeded games once with every player in full hand mode and once in delta mode, and compare how much
+    the bot sends.
+    """
+    import shutil
+    import tempfile
+
+    tmpdir = tempfile.mkdtemp()
+    nicks = ['player%d' % n for n in range(players)]
+    results = {}
+    try:
+        for mode in (HAND_FULL, HAND_DELTA):
+            unobot = UnoBot(os.path.join(tmpdir, 'unoscores.txt'))
+            bot = HeadlessBot(homedir=tmpdir)
+            for nick in nicks:
+                bot.db.set_nick_value(nick, 'uno_hand', mode)
+            turns = sum(simulate_game(unobot, bot, '#bench', nicks, seed)[0] for seed in range(games))
+            unobot.close()
+            results[mode] = (bot.bytes_by_kind['NOTICE'] / float(games), bot.bytes / float(games))
+    finally:
+        shutil.rmtree(tmpdir)
+    print('%d %d-player games, %.1f turns per game' % (games, players, turns / float(games)))
+    for mode in (HAND_FULL, HAND_DELTA):
+        print('%-5s hands: %7.0f notice bytes/game, %7.0f total bytes/game' % ((HAND_MODE_NAMES[mode],) + results[mode]))
+    saved = results[HAND_FULL][1] - results[HAND_DELTA][1]
+    print('delta mode saves %.0f bytes/game (%.0f%% of all output)' % (saved, 100 * saved / results[HAND_FULL][1]))
+
+
+def selfplay(games=200, players=4, budget=AI_MOVE_BUDGET):
+    """
+    Seat UnoAI against players picking their moves at random, and report how often it wins and how long its moves take.
+    """
+    import shutil
+    import tempfile
+
+    tmpdir = tempfile.mkdtemp()
+    nicks = ['ai'] + ['random%d' % n for n in range(1, players)]
+    ai = UnoAI(budget)
+    rng = random.Random(0)
+    moves = Histogram()
+
+    def choose(game, plays):
+        if game.playerOrder[game.currentPlayer] != 'ai':
+            return rng.choice(plays)
+        start = timer()
+        play = ai.choose(game, plays)
+        moves.observe(timer() - start)
+        return play
+
+    wins = unfinished = 0
+    try:
+        unobot = UnoBot(os.path.join(tmpdir, 'unoscores.txt'))
+        bot = HeadlessBot(homedir=tmpdir)
+        for seed in range(games):
+            turns, winner = simulate_game(unobot, bot, '#selfplay', nicks, seed, choose)
+            wins += winner == 'ai'
+            unfinished += winner is None
+        unobot.close()
+    finally:
+        shutil.rmtree(tmpdir)
+    print('%d %d-player games: AI won %d (%.1f%%; %.1f%% would be par), %d unfinished' % (
+        games, players, wins, 100.0 * wins / games, 100.0 / players, unfinished))
+    print('%d AI moves: mean %.3fms, p99 %.3fms, max %.3fms (budget %.0fms)' % (
+        moves.count, 1000 * moves.total / max(moves.count, 1), 1000 * moves.percentile(99), 1000 * moves.max,
+        1000 * budget))
+
+
+def bench_replay(path, repeat=1):
+    events = list(read_game_log(path))
+    bot = HeadlessBot()
+    start = timer()
+    for _ in range(repeat):
+        game = replay_game(events, bot)
+    elapsed = timer() - start
+    print('Replayed %d events %d times in %.3fs (%.0f events/sec)' % (
+        len(events), repeat, elapsed, len(events) * repeat / elapsed))
+    print('Top card: %s, current player: %s, way: %d, deck: %d cards' % (
+        game.topCard, game.playerOrder[game.currentPlayer] if game.playerOrder else None, game.way, len(game.deck)))
+    for nick in game.playerOrder:
+        print('  %s: %s' % (nick, ' '.join(game.players[nick])))
+
+
+def check_invariants(unobot):
+    """
+    Everything that should hold between any two UNO commands, as a list of what doesn't. Call with the game lock
+    held, so no command is halfway through.
+    """
+    problems = []
+    channels = {}
+    for key, game in list(unobot.games.items()):
+        if key not in unobot.tables:
+            if key != game.channel:
+                problems.append('%s: game thinks it is in %s' % (key, game.channel))
+            if game.channel in channels:
+                problems.append('%s: second game in %s' % (key, game.channel))
+            channels[game.channel] = key
+        if len(game.playerOrder) != len(game.players) or set(game.playerOrder) != set(game.players):
+            problems.append('%s: playerOrder %r vs players %r' % (key, game.playerOrder, list(game.players)))
+        if game.owner not in game.players:
+            problems.append('%s: owner %s is not playing' % (key, game.owner))
+        for nick in list(game.shownHands) + list(game.aiPlayers) + list(game.standings):
+            if nick not in game.players:
+                problems.append('%s: left-over state for %s' % (key, nick))
+        if not game.dealt:
+            if game.deck or any(game.players.values()):
+                problems.append('%s: cards out before the deal' % key)
+            continue
+        if not 0 <= game.currentPlayer < len(game.playerOrder):
+            problems.append('%s: currentPlayer %d of %d' % (key, game.currentPlayer, len(game.playerOrder)))
+        cards = list(game.deck)
+        for hand in list(game.players.values()) + list(game.deadPlayers.values()):
+            cards.extend(hand)
+        cards.append(game.topCard[1:] if 'W' in game.topCard[1:] else game.topCard)
+        extra = list(cards)
+        for card in FULL_DECK:
+            if card in extra:
+                extra.remove(card)
+        if extra or len(cards) + game.discarded != len(FULL_DECK):
+            problems.append('%s: %d cards in play and %d discarded, not %d (unexpected: %s)' % (
+                key, len(cards), game.discarded, len(FULL_DECK), ' '.join(extra) or 'none'))
+    return problems
+
+
+def _stress_games_worker(unobot, bot, channels, people, names, rename_lock, ops, seed, failures):
+    rng = random.Random(seed)
+    for n in range(ops):
+        channel = rng.choice(channels)
+        person = rng.randrange(len(people))
+        nick = names[person]
+        game = unobot.games.get(channel)
+        if game is not None and game.playerOrder and rng.random() < 0.6:
+            try:
+                nick = game.playerOrder[game.currentPlayer]  # whoever's turn it looks like, lock or no lock
+            except IndexError:
+                pass
+        op = rng.choice(STRESS_OPS)
+        admin = rng.random() < 0.1
+        try:
+            if op == 'play' and game is not None:
+                with lock:
+                    plays = game.legal_plays() if game.deck and unobot.games.get(channel) is game else []
+                if plays:
+                    searchcard, playcard = rng.choice(plays)
+                    unobot.play(bot, BotTrigger(nick, channel, [playcard[0], playcard[1:]]))
+                else:
+                    unobot.fml(bot, BotTrigger(nick, channel))
+            elif op == 'kick':
+                victim = names[rng.randrange(len(people))]
+                unobot.kick(bot, BotTrigger(nick, channel, [victim], admin=admin))
+            elif op == 'move':
+                unobot.move_game(bot, BotTrigger(nick, channel, [rng.choice(channels)], admin=admin))
+            elif op == 'nick':
+                with rename_lock:  # IRC itself never lets two people hold one nick
+                    old = names[person]
+                    new = tools.Identifier(people[person] if old != people[person] else people[person] + '_')
+                    names[person] = new
+                unobot.nick_change(bot, HeadlessNickTrigger(old, new))
+            elif op == 'ai':
+                unobot.add_ai(bot, BotTrigger(nick, channel))
+            elif op == 'stop':
+                unobot.stop(bot, BotTrigger(nick, channel, admin=admin))
+            elif op == 'deal':
+                unobot.deal(bot, BotTrigger(nick, channel, admin=admin))
+            elif op in ('draw', 'pass_', 'fml', 'start', 'join', 'quit'):
+                getattr(unobot, op)(bot, BotTrigger(nick, channel))
+        except Exception:
+            import traceback
+            failures.append('%s by %s in %s raised:\n%s' % (op, nick, channel, traceback.format_exc()))
+        with lock:
+            problems = check_invariants(unobot)
+        if problems:
+            failures.append('after %s by %s in %s: %s' % (op, nick, channel, '; '.join(problems)))
+            return
+
+
+# what the game stress test's threads do; play also covers draw/pass when there's nothing to play
+STRESS_OPS = ('start', 'join', 'join', 'quit', 'kick', 'deal', 'deal', 'play', 'play', 'play', 'play', 'play',
+              'play', 'play', 'draw', 'pass_', 'fml', 'stop', 'move', 'nick', 'ai')
+
+
+def stress_games(threads=8, ops=2000, channels=3, players=6, seed=0):
+    """
+    Hammer a few channels' games from many threads at once with every UnoBot entry point, checking the invariants
+    after each call. Returns whether nothing broke.
+    """
+    import shutil
+    import tempfile
+
+    tmpdir = tempfile.mkdtemp()
+    chans = [tools.Identifier('#stress%d' % n) for n in range(channels)]
+    people = ['player%d' % n for n in range(players)]
+    names = [tools.Identifier(nick) for nick in people]
+    failures = []
+    switch = sys.getswitchinterval() if hasattr(sys, 'getswitchinterval') else None
+    if switch is not None:
+        sys.setswitchinterval(1e-6)  # switch threads as often as possible, to shake out more interleavings
+    try:
+        unobot = UnoBot(os.path.join(tmpdir, 'unoscores.txt'))
+        bot = HeadlessBot(homedir=tmpdir)
+        bot.privileges = dict((chan.lower(), {}) for chan in chans)
+        rename_lock = threading.Lock()
+        workers = [threading.Thread(target=_stress_games_worker, args=(
+            unobot, bot, chans, people, names, rename_lock, ops, seed * threads + n, failures)) for n in range(threads)]
+        start = timer()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = timer() - start
+        unobot.close()
+    finally:
+        if switch is not None:
+            sys.setswitchinterval(switch)
+        shutil.rmtree(tmpdir)
+    print('%d threads x %d calls on %d channels in %.2fs (%d lines sent)' % (
+        threads, ops, channels, elapsed, bot.lines))
+    for failure in failures[:5]:
+        print(failure)
+    if len(failures) > 5:
+        print('... and %d more' % (len(failures) - 5))
+    print('invariants held' if not failures else '%d failures' % len(failures))
+    return not failures
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="UnoBot tools that run without a Sopel instance.")
+    commands = parser.add_subparsers(dest='command')
+    cmd = commands.add_parser('bench-memory', help="report resident bytes per game and per ranked player")
+    cmd.add_argument('--games', type=int, default=1000)
+    cmd.add_argument('--ranked', type=int, default=10000)
+    cmd = commands.add_parser('export', help="stream a score file out as JSON Lines or CSV")
+    cmd.add_argument('scorefile')
+    cmd.add_argument('output', help="output file; .csv for CSV, anything else for JSON Lines")
+    cmd = commands.add_parser('import', help="merge exports or other score files into a score file")
+    cmd.add_argument('scorefile')
+    cmd.add_argument('inputs', nargs='+', help=".jsonl or .csv exports, or score files in either format")
+    cmd = commands.add_parser('convert', help="convert an old plain text score file to JSON")
+    cmd.add_argument('scorefile')
+    cmd = commands.add_parser('analytics', help="print score analytics (needs NumPy)")
+    cmd.add_argument('scorefile')
+    cmd.add_argument('--logs', help="event log directory, for Elo ratings and per-channel stats")
+    cmd.add_argument('--player', action='append', default=[], help="also show this player's stats")
+    cmd = commands.add_parser('stress-games', help="call game commands from many threads at once and check invariants")
+    cmd.add_argument('--threads', type=int, default=8)
+    cmd.add_argument('--ops', type=int, default=2000, help="calls per thread")
+    cmd.add_argument('--channels', type=int, default=3)
+    cmd.add_argument('--players', type=int, default=6)
+    cmd.add_argument('--seed', type=int, default=0)
+    cmd = commands.add_parser('bench-output', help="compare bytes sent per game in full vs delta hand mode")
+    cmd.add_argument('--games', type=int, default=200)
+    cmd.add_argument('--players', type=int, default=4)
+    cmd = commands.add_parser('selfplay', help="play the built-in AI against random players and report its win rate")
+    cmd.add_argument('--games', type=int, default=200)
+    cmd.add_argument('--players', type=int, default=4)
+    cmd.add_argument('--budget', type=float, default=AI_MOVE_BUDGET, help="AI time budget per move, in seconds")
+    cmd = commands.add_parser('replay', help="rebuild a game from its event log and print the final state")
+    cmd.add_argument('log')
+    cmd.add_argument('--repeat', type=int, default=1, help="replay this many times to measure throughput")
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench-memory':
+        bench_memory(args.games, args.ranked)
+    elif args.command == 'export':
+        print('Exported %d entries.' % write_score_export(args.output, iter_score_export(args.scorefile, 'json')))
+    elif args.command == 'import':
+        sources = [iter_score_export(path) for path in args.inputs]
+        if os.path.exists(args.scorefile):
+            sources.insert(0, iter_score_export(args.scorefile, 'json'))
+        merged = merge_score_entries(*sources)
+        write_score_file(args.scorefile, merged)
+        print('Wrote %d players to %s.' % (len(merged), args.scorefile))
+    elif args.command == 'convert':
+        write_score_file(args.scorefile, iter_legacy_score_file(args.scorefile))
+    elif args.command == 'analytics':
+        if numpy is None:
+            print('Analytics need NumPy, which is not installed.')
+            return 1
+        analytics = ScoreAnalytics(iter_score_export(args.scorefile, 'json'), iter_game_history(args.logs))
+        for line in analytics.summary_lines(top=10) + [analytics.player_line(nick) for nick in args.player]:
+            print(line)
+    elif args.command == 'stress-games':
+        return 0 if stress_games(args.threads, args.ops, args.channels, args.players, args.seed) else 1
+    elif args.command == 'bench-output':
+        bench_output(args.games, args.players)
+    elif args.command == 'selfplay':
+        selfplay(args.games, args.players, args.budget)
+    elif args.command == 'replay':
+        bench_replay(args.log, args.repeat)
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
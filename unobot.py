@@ -5,17 +5,42 @@ This file is covered under the project license, located in LICENSE.md
 import sopel.module as module
 import sopel.tools as tools
 from sopel.formatting import colors, CONTROL_BOLD, CONTROL_COLOR, CONTROL_NORMAL
+import cProfile
+import csv
+import functools
+import itertools
 import json
+import logging
 import os
+import pstats
 import random
+import re
 import sys
 import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from timeit import default_timer as timer
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import numpy
+except ImportError:  # only needed for .unoanalytics
+    numpy = None
+
+LOGGER = logging.getLogger(__name__)
 
 # niceties for Python 2 / 3 compatibility
 if sys.version_info.major < 3:
     range = xrange
     str = unicode
+    import Queue as queue
+else:
+    import queue
 
 HAND_SIZE = 7
 MINIMUM_HAND_FOR_JOIN = 5
@@ -36,7 +61,229 @@ THEMES = {
 }
 THEME_NAMES = dict((v, n) for (n, v) in THEMES.items())
 
-lock = threading.RLock()
+HAND_FULL = 0
+HAND_DELTA = 1
+HAND_MODES = {
+    'full':  HAND_FULL,
+    'delta': HAND_DELTA,
+}
+HAND_MODE_NAMES = dict((v, n) for (n, v) in HAND_MODES.items())
+
+
+class Histogram(object):
+    """
+    Fixed-bucket latency histogram. Bucket bounds are in seconds; the last bucket catches everything slower.
+    """
+    BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        i = 0
+        for bound in self.BOUNDS:
+            if seconds <= bound:
+                break
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, pct):
+        """
+        Upper bound of the bucket holding the given percentile, capped at the slowest observation.
+        """
+        if not self.count:
+            return 0.0
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                if i < len(self.BOUNDS):
+                    return min(self.BOUNDS[i], self.max)
+                break
+        return self.max
+
+
+class UnoMetrics(object):
+    """
+    Per-handler call/error counters and latency histograms, plus timers for lock waits and score file I/O.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+        self.gauges = {}  # name -> callable returning the current value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            hist = self.timers.get(name)
+            if hist is None:
+                hist = self.timers[name] = Histogram()
+            hist.observe(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary_lines(self):
+        lines = []
+        with self._lock:
+            for name in sorted(self.timers):
+                hist = self.timers[name]
+                lines.append("%s: %d calls, %d errors, p50 %.1fms, p95 %.1fms, p99 %.1fms, max %.1fms" % (
+                    name, hist.count, self.counters.get(name + '.errors', 0), hist.percentile(50) * 1000,
+                    hist.percentile(95) * 1000, hist.percentile(99) * 1000, hist.max * 1000))
+            for name in sorted(self.counters):
+                if not name.endswith('.errors'):
+                    lines.append("%s: %d" % (name, self.counters[name]))
+            for name in sorted(self.gauges):
+                lines.append("%s: %d" % (name, self.gauges[name]()))
+        return lines
+
+    def render_text(self):
+        """
+        Prometheus text exposition format, so the dump can be picked up by a node_exporter textfile collector.
+        """
+        out = ['# TYPE unobot_seconds histogram']
+        with self._lock:
+            for name in sorted(self.timers):
+                hist = self.timers[name]
+                cumulative = 0
+                for bound, n in zip(Histogram.BOUNDS, hist.buckets):
+                    cumulative += n
+                    out.append('unobot_seconds_bucket{name="%s",le="%s"} %d' % (name, bound, cumulative))
+                out.append('unobot_seconds_bucket{name="%s",le="+Inf"} %d' % (name, hist.count))
+                out.append('unobot_seconds_sum{name="%s"} %f' % (name, hist.total))
+                out.append('unobot_seconds_count{name="%s"} %d' % (name, hist.count))
+            out.append('# TYPE unobot_total counter')
+            for name in sorted(self.counters):
+                out.append('unobot_total{name="%s"} %d' % (name, self.counters[name]))
+            out.append('# TYPE unobot_gauge gauge')
+            for name in sorted(self.gauges):
+                out.append('unobot_gauge{name="%s"} %d' % (name, self.gauges[name]()))
+        return '\n'.join(out) + '\n'
+
+
+metrics = UnoMetrics()
+
+
+class TimedLock(object):
+    """
+    The module-wide reentrant lock, recording how long callers were blocked whenever it was contended.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        if not self._lock.acquire(False):
+            start = timer()
+            self._lock.acquire()
+            metrics.observe('lock_wait', timer() - start)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+lock = TimedLock()
+system_random = random.SystemRandom()
+
+
+class ProfileSession(object):
+    """
+    Runs cProfile around the next `calls` handler calls, or every handler call for `seconds`, then writes the
+    aggregated stats to the bot's homedir and posts the top functions by cumulative time to whoever started it.
+    """
+    SUMMARY_SIZE = 5
+
+    def __init__(self, bot, destination, calls=None, seconds=None):
+        self.bot = bot
+        self.destination = destination
+        self.remaining = calls
+        self.profile = cProfile.Profile()
+        self.path = os.path.join(bot.config.core.homedir,
+                                 datetime.now().strftime('unoprofile-%Y%m%d-%H%M%S.pstats'))
+        self._lock = threading.RLock()
+        self.timer = None
+        if seconds:
+            self.timer = threading.Timer(seconds, self.finish)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def run(self, func, bot, trigger):
+        # only one thread can be profiled at a time; calls that overlap a profiled call just run normally
+        if not self._lock.acquire(False):
+            return func(bot, trigger)
+        try:
+            self.profile.enable()
+            try:
+                return func(bot, trigger)
+            finally:
+                self.profile.disable()
+                if self.remaining is not None:
+                    self.remaining -= 1
+        finally:
+            self._lock.release()
+            if self.remaining is not None and self.remaining <= 0:
+                self.finish()
+
+    def finish(self):
+        global profiling
+        with self._lock:
+            if profiling is not self:
+                return
+            profiling = None
+        if self.timer:
+            self.timer.cancel()
+        try:
+            stats = pstats.Stats(self.profile)
+        except TypeError:  # nothing was profiled
+            self.bot.say("UNO profiler stopped without recording any handler calls.", self.destination)
+            return
+        stats.dump_stats(self.path)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=YES)
+        top = []
+        for (filename, line, funcname), (cc, nc, tt, ct, callers) in rows:
+            if filename == '~':  # C builtins and the profiler's own bookkeeping
+                continue
+            top.append("%s:%d %s %.1fms" % (os.path.basename(filename), line, funcname, ct * 1000))
+            if len(top) == self.SUMMARY_SIZE:
+                break
+        self.bot.say("UNO profile saved to %s. Top by cumulative time: %s" % (self.path, '; '.join(top)),
+                     self.destination)
+
+
+profiling = None
+
+
+def instrumented(func):
+    """
+    Time every call to a plugin handler. Must be the innermost decorator so Sopel's attributes land on the wrapper.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(bot, trigger):
+        start = timer()
+        try:
+            if profiling is not None:
+                return profiling.run(func, bot, trigger)
+            return func(bot, trigger)
+        except Exception:
+            metrics.count(name + '.errors')
+            raise
+        finally:
+            metrics.observe(name, timer() - start)
+    return wrapper
+
 
 STRINGS = {
     'GAME_STARTED':    "IRC-UNO started by %s - Type join to join!",
@@ -73,12 +320,17 @@ STRINGS = {
     'NO_SCORES':       "No scores yet",
     'YOUR_RANK':       "%s is ranked #%d in UNO, having accumulated %d %s from %d %s.",
     'NOT_RANKED':      "%s hasn't finished an UNO game, and thus has no rank yet.",
+    'BOARD_RANK':      "%s is ranked #%d in UNO %s, having accumulated %d %s from %d %s.",
+    'BOARD_NOT_RANKED': "%s hasn't finished an UNO game %s, and thus has no rank there yet.",
+    'BOARD_TOP':       "Top UNO players %s:",
     'SCORE_ROW':       "#%s %s (%d %s in %d %s (%d won), %s wasted, %.3f pts/sec, %.1f pts/game, %.1f pts/won)",
     'TOP_CARD':        "%s's turn. Top Card: %s",
     'YOUR_CARDS':      "Your cards (%d): %s",
+    'TOP_CARD_NOTICE': "Top Card: %s",
     'NEXT_START':      "Next: ",
     'SB_START':        "Standings: ",
     'SB_PLAYER':       "%s (%d)",
+    'NEXT_MORE':       "+%d more, fewest: %s",
     'D2':              "%s draws two and is skipped!",
     'CARDS':           "Cards: %s",
     'WD4':             "%s draws four and is skipped!",
@@ -97,6 +349,11 @@ STRINGS = {
     'THEME_CURRENT':   "You are currently using the %s card theme.",
     'THEME_NEEDED':    "You must specify one of the available themes: %s",
     'THEME_SET':       "Will use the %s card theme on your UNO turn.",
+    'HAND_CURRENT':    "Your UNO hand is sent in %s mode on your turn.",
+    'HAND_NEEDED':     "You must specify one of the hand modes: %s",
+    'HAND_SET_FULL':   "Will send your whole UNO hand on every turn.",
+    'HAND_SET_DELTA':  "Will send only what changed in your UNO hand on your turn; use %pcards for the whole hand.",
+    'NO_CHANGE':       "no change",
     'HELP_INTRO':      "I am sending you UNO help privately. If you do not see it, configure your client to show "
                        "non-server notices in the current channel. Cards are sent the same way during game-play.",
     'HELP_LINES':      ["UNO is played using the %pplay, %pdraw, and %ppass commands.",
@@ -109,19 +366,221 @@ STRINGS = {
                         "Use %punotheme (dark|light) if you are having trouble reading your cards to give them a "
                         "dark/light background color, respectively. Use %punotheme default to reset it.",
                         "Alternatively, do %punocolors off to use an alternate presentation format that doesn't "
-                        "use color codes at all."],
+                        "use color codes at all.",
+                        "Use %punohand delta to be sent only the cards you gained (+) and lost (-) on your turn "
+                        "instead of your whole hand; %pcards always shows the whole hand.",
+                        "Short on players? %punoai deals me in as a computer player. The game owner can "
+                        "%punokick me again."],
     'PLAY_SYNTAX':     "Command syntax error. You must use e.g. %pplay r 3 or %pplay w y.",
+    'TOURNEY_OPEN':    "UNO tournament run by %s is open for entries! Type %punotourney join to enter.",
+    'TOURNEY_RUNNING': "There's already an UNO tournament in %s.",
+    'TOURNEY_NONE':    "No UNO tournament here. Start one with %punotourney open.",
+    'TOURNEY_CANT':    "Only %s or a bot admin can do that.",
+    'TOURNEY_STARTED': "The UNO tournament has already started.",
+    'TOURNEY_ENTERED': "Entered in the UNO tournament: %s (%d entrants).",
+    'TOURNEY_LEFT':    "%s withdrew from the UNO tournament (%d entrants).",
+    'TOURNEY_ENTRIES': "UNO tournament entrants (%d): %s",
+    'TOURNEY_NOT_ENOUGH': "An UNO tournament needs at least two entrants.",
+    'TOURNEY_ROUND':   "UNO tournament round %d: %d players at %d %s. Play as usual; I know your table.",
+    'TOURNEY_BYE':     "%s gets a bye to the next round.",
+    'TOURNEY_TABLE':   "[T%d] %s",
+    'TOURNEY_SEATED':  "Seated: %s",
+    'TOURNEY_ADVANCES': "%s goes through to round %d!",
+    'TOURNEY_NO_WINNER': "Table closed with nobody left to go through.",
+    'TOURNEY_CHAMPION': "%s wins the UNO tournament!",
+    'TOURNEY_NO_CHAMPION': "The UNO tournament is over: nobody went through from the last round, so no champion.",
+    'TOURNEY_STATUS':  "UNO tournament round %d: %d tables still playing, %d players through so far.",
+    'TOURNEY_STOPPED': "UNO tournament stopped.",
+    'TOURNEY_SYNTAX':  "Use %punotourney open|join|leave|add <nicks>|go [table size]|stop, or %punotourney for status.",
 }  # yapf: disable
 # don't sort card values to ensure 0 is ALWAYS first
 COLORED_CARD_NUMS = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'R', 'S', 'D2']
 CARD_COLORS = 'RGBY'
 SPECIAL_CARDS = ['W', 'WD4']
+# one copy of every card in a fresh deck; hands and the deck reference these shared strings instead of each deal
+# concatenating its own
+FULL_DECK = tuple(
+    [color + card for card in (COLORED_CARD_NUMS + COLORED_CARD_NUMS[1:]) for color in CARD_COLORS] +
+    [card for card in SPECIAL_CARDS for _ in range(4)]
+) * 2
+
 
+def _build_play_spellings():
+    """
+    Map every accepted way of naming a card to play to (card to look for in the hand, card as played), e.g.
+    ('R', 'D2'), ('D2', 'R') and 'RD2' to ('RD2', 'RD2'), or ('W', 'Y'), 'WY' and 'YW' to ('W', 'YW').
 
-class UnoGame:
-    def __init__(self, trigger):
+    Two-argument `play` commands look up (arg1, arg2); short forms like "rd2" said in channel look up the whole
+    string, split as "colour then card" unless it starts with W, in which case the colour is the last letter.
+    """
+    spellings = {}
+    for color in CARD_COLORS:
+        for card in COLORED_CARD_NUMS + SPECIAL_CARDS:
+            played = (card if card in SPECIAL_CARDS else color + card, color + card)
+            spellings[(color, card)] = spellings[(card, color)] = played
+    for (first, second) in list(spellings):
+        short = first + second
+        if short[0] == 'W':
+            pair = (short[:-1], short[-1:])
+        else:
+            pair = (short[:1], short[1:])
+        if pair in spellings:
+            spellings[short] = spellings[pair]
+    return spellings
+
+
+PLAY_SPELLINGS = _build_play_spellings()
+
+# when a server advertises NOTICE with no target limit, still don't address more than this many nicks per line
+NOTICE_FANOUT_CAP = 10
+# leave room in the 512-byte IRC line for the prefix the server adds when relaying
+NOTICE_LINE_BUDGET = 400
+# the "Next:" part of a hand notice lists every other player up to this many; beyond that it names only the next few
+# and the smallest hand among the rest, so the notice doesn't grow with the table
+NEXT_LIST_MAX = 5
+NEXT_SUMMARY_PLAYERS = 3
+
+
+def notice_targets(bot):
+    """
+    How many nicks one NOTICE may be addressed to, going by the server's ISUPPORT TARGMAX or MAXTARGETS. Servers that
+    advertise neither (and Sopel versions that don't track ISUPPORT) get one target per NOTICE.
+    """
+    support = getattr(bot, 'isupport', None)
+    if support is None:
+        return 1
+    targmax = support.get('TARGMAX')
+    if targmax is not None:
+        limit = dict(targmax).get('NOTICE', 1)
+        return NOTICE_FANOUT_CAP if limit is None else max(1, min(limit, NOTICE_FANOUT_CAP))
+    maxtargets = support.get('MAXTARGETS')
+    if maxtargets:
+        return max(1, min(int(maxtargets), NOTICE_FANOUT_CAP))
+    return 1
+
+
+def notice_many(bot, message, nicks):
+    """
+    Send the same NOTICE to several nicks in as few lines as the server allows.
+    """
+    limit = notice_targets(bot)
+    batch = []
+    length = len(message)
+    for nick in nicks:
+        if batch and (len(batch) == limit or length + len(nick) + 1 > NOTICE_LINE_BUDGET):
+            bot.notice(message, ','.join(batch))
+            batch = []
+            length = len(message)
+        batch.append(nick)
+        length += len(nick) + 1
+    if batch:
+        bot.notice(message, ','.join(batch))
+
+
+class BotTrigger(object):
+    """
+    A command trigger as Sopel would build it for `.command arg1 arg2`, for commands the bot gives on a player's
+    behalf: the AI's moves, dealing tournament tables, and replaying or simulating games outside of Sopel.
+    """
+    def __init__(self, nick, sender, args=(), admin=NO):
+        self.nick = tools.Identifier(nick)
+        self.sender = tools.Identifier(sender)
+        self.admin = admin
+        self.args = [str(a) for a in args]
+
+    def group(self, n=0):
+        if n == 0:
+            return ' '.join(self.args)
+        if n == 2:
+            return ' '.join(self.args) or None
+        if 3 <= n < 3 + len(self.args):
+            return self.args[n - 3]
+        return None
+
+    def groups(self):
+        return tuple(self.group(n) for n in range(1, 7))
+
+
+# an AI move has to be picked within this many seconds; whatever scored best by then gets played
+AI_MOVE_BUDGET = 0.05
+# most turns the AI takes in a row before handing control back, e.g. if it keeps skipping the only other player
+AI_MAX_TURNS = 50
+
+
+class UnoAI(object):
+    """
+    Heuristic move policy for computer players. Every legal play is scored on its own, so picking a move is a single
+    pass over UnoGame.legal_plays(); once the time budget runs out, the best play found so far is used.
+    """
+    # what each face is worth to the winner if it's still in hand at the end, so expensive cards get shed first
+    POINTS = dict([(num, int(num)) for num in '0123456789'] + [('R', 20), ('S', 20), ('D2', 20), ('W', 50),
+                                                               ('WD4', 50)])
+    __slots__ = ('budget',)
+
+    def __init__(self, budget=AI_MOVE_BUDGET):
+        self.budget = budget
+
+    def choose(self, game, plays, budget=None):
+        """
+        Pick one of `plays` for the current player. Same signature as the `choose` argument of simulate_game() in
+        tools/unotools.py.
+        """
+        start = timer()
+        deadline = start + (self.budget if budget is None else budget)
+        with lock:  # only long enough to snapshot what the heuristic looks at
+            seat = game.currentPlayer % len(game.playerOrder)  # the game may have moved on since `plays`
+            hand = list(game.players[game.playerOrder[seat]])
+            nxt = game.playerOrder[(seat + game.way) % len(game.playerOrder)]
+            threat = len(game.players[nxt]) <= 2
+        colors = dict((color, 0) for color in CARD_COLORS)
+        for card in hand:
+            if card[0] in colors:
+                colors[card[0]] += 1
+        best = plays[0]
+        best_score = None
+        for play in plays:
+            if timer() > deadline:
+                metrics.count('ai.timeouts')
+                break
+            score = self.score(play, colors, threat)
+            if best_score is None or score > best_score:
+                best, best_score = play, score
+        metrics.observe('ai.move', timer() - start)
+        return best
+
+    def score(self, play, colors, threat):
+        searchcard, playcard = play
+        face = searchcard if searchcard in SPECIAL_CARDS else searchcard[1:]
+        # stay in (or, for wilds, switch to) the color we hold the most of, shedding high cards first
+        score = colors[playcard[0]] * 2 + self.POINTS[face] / 10.0
+        if face == 'WD4':
+            score -= 15  # last resort: nothing else can follow every color
+        elif face == 'W':
+            score -= 10
+        elif face in ('R', 'S', 'D2'):
+            score -= 4  # worth more held back, for when someone is about to go out
+        if threat and face in ('R', 'S', 'D2', 'WD4'):
+            score += 30
+        return score
+
+
+class UnoGame(object):
+    __slots__ = (
+        'owner', 'channel', 'deck', 'players', 'deadPlayers', 'playerOrder', 'currentPlayer', 'previousPlayer',
+        'topCard', 'way', 'drawn', 'smallestHand', 'startTime', 'dealt', 'seed', 'draws', 'log',
+        'shownHands', 'aiPlayers', 'discarded', 'standings',
+    )
+
+    def __init__(self, trigger, log=None, seed=None):
         self.owner = trigger.nick
         self.channel = trigger.sender
+        # every game draws from its own generators, so games never contend for (or perturb) the global one and any
+        # game can be reproduced from its seed
+        if seed is None:
+            seed = system_random.getrandbits(64)
+        self.seed = seed
+        self.draws = 0
+        self.log = log
         self.deck = []
         self.players = {self.owner: []}
         self.deadPlayers = {}
@@ -135,68 +594,82 @@ class UnoGame:
         self.deck = []
         self.startTime = None
         self.dealt = NO
-
-    def join(self, bot, trigger):
+        self.shownHands = {}  # nick -> hand as of the last full/delta hand notice, for players using delta mode
+        self.aiPlayers = set()  # seats played by UnoAI, which get no hand notices
+        self.discarded = 0  # cards under the top card, which only come back into play with the next reshuffle
+        self.standings = {}  # nick -> (hand size, rendered "nick (size)"), redone only when that hand's size changes
+        self.record('start', owner=self.owner, channel=self.channel, ts=int(time.time()))
+
+    def record(self, event, **fields):
+        if self.log is not None:
+            fields['ev'] = event
+            self.log.record(self, fields)
+
+    def join(self, bot, trigger, nick=None):
+        nick = nick or trigger.nick
         with lock:
-            if trigger.nick not in self.players:
-                if self.smallestHand < MINIMUM_HAND_FOR_JOIN and trigger.nick not in self.deadPlayers:
-                    bot.say(STRINGS['CANT_JOIN'] % trigger.nick)
+            if nick not in self.players:
+                if self.smallestHand < MINIMUM_HAND_FOR_JOIN and nick not in self.deadPlayers:
+                    bot.say(STRINGS['CANT_JOIN'] % nick)
                     return
-                self.players[trigger.nick] = []
-                self.playerOrder.append(trigger.nick)
+                self.players[nick] = []
+                self.playerOrder.append(nick)
+                self.record('join', nick=nick)
                 if self.deck:
-                    if trigger.nick in self.deadPlayers:
-                        self.players[trigger.nick] = self.deadPlayers.pop(trigger.nick)
+                    if nick in self.deadPlayers:
+                        self.players[nick] = self.deadPlayers.pop(nick)
                         bot.say(STRINGS['DEALING_BACK'] % (
-                            trigger.nick, self.playerOrder.index(trigger.nick) + 1
+                            nick, self.playerOrder.index(nick) + 1
                         ))
                         return
                     for i in range(0, HAND_SIZE):
-                        self.players[trigger.nick].append(self.get_card())
+                        self.players[nick].append(self.get_card())
                     bot.say(STRINGS['DEALING_IN'] % (
-                        trigger.nick, self.playerOrder.index(trigger.nick) + 1
+                        nick, self.playerOrder.index(nick) + 1
                     ))
                 else:
                     bot.say(STRINGS['JOINED'] % (
-                        trigger.nick, self.playerOrder.index(trigger.nick) + 1
+                        nick, self.playerOrder.index(nick) + 1
                     ))
                     if len(self.players) > 1:
                         bot.notice(STRINGS['ENOUGH'], self.owner)
 
     def quit(self, bot, trigger):
         player = trigger.nick
-        if player not in self.players:
-            return
         with lock:
+            if player not in self.players:
+                return
             playernum = self.playerOrder.index(player) + 1
             bot.say(STRINGS['PLAYER_QUIT'] % (player, playernum))
+            self.record('quit', nick=player)
             return self.remove_player(bot, player)
 
-    def kick(self, bot, trigger):
-        if trigger.nick != self.owner and not trigger.admin:
-            bot.say(STRINGS['CANT_KICK'] % self.owner)
-            return
+    def kick(self, bot, trigger, admin=NO):
         player = tools.Identifier(trigger.group(3))
         with lock:
+            if trigger.nick != self.owner and not trigger.admin and not admin:
+                self.tell(bot, STRINGS['CANT_KICK'] % self.owner, trigger.nick)
+                return
             if player not in self.players:
                 return
             if player == trigger.nick:
                 return self.quit(bot, trigger)
             playernum = self.playerOrder.index(player) + 1
             bot.say(STRINGS['PLAYER_KICK'] % (player, playernum, trigger.nick))
+            self.record('kick', nick=player, by=trigger.nick)
             return self.remove_player(bot, player)
 
     def deal(self, bot, trigger):
-        if len(self.players) < 2:
-            bot.say(STRINGS['NOT_ENOUGH'])
-            return
-        if len(self.deck):
-            bot.say(STRINGS['ALREADY_DEALT'])
-            return
-        if trigger.nick != self.owner and not trigger.admin:
-            bot.say(STRINGS['NEEDS_TO_DEAL'] % self.owner)
-            return
         with lock:
+            if len(self.players) < 2:
+                self.tell(bot, STRINGS['NOT_ENOUGH'], trigger.nick)
+                return
+            if len(self.deck):
+                self.tell(bot, STRINGS['ALREADY_DEALT'], trigger.nick)
+                return
+            if trigger.nick != self.owner and not trigger.admin:
+                self.tell(bot, STRINGS['NEEDS_TO_DEAL'] % self.owner, trigger.nick)
+                return
             self.startTime = datetime.now()
             self.deck = self.create_deck()
             for i in range(0, HAND_SIZE):
@@ -204,53 +677,38 @@ class UnoGame:
                     self.players[p].append(self.get_card())
             self.topCard = self.get_card()
             while self.topCard in ['W', 'WD4']:
+                self.discarded += 1
                 self.topCard = self.get_card()
             self.dealt = YES
-            self.currentPlayer = random.randrange(len(self.players))  # issue #6
+            self.currentPlayer = self.next_rng().randrange(len(self.players))  # issue #6
+            self.record('deal', by=trigger.nick, seed=self.seed)
             self.card_played(bot, self.topCard)
             self.show_on_turn(bot)
 
     def play(self, bot, trigger):
-        if not self.deck:
-            return
-        if trigger.nick not in self.players:
-            bot.notice(STRINGS['NOT_PLAYING'], trigger.nick)
-            return
-        if trigger.nick != self.playerOrder[self.currentPlayer]:
-            bot.say(STRINGS['ON_TURN'] % self.playerOrder[self.currentPlayer])
-            return
-
-        try:
-            if len(trigger.groups()) > 1:
-                color, card = trigger.group(3).upper(), trigger.group(4).upper()  # raises AttributeError if either missing
-            else:
-                if trigger.group(0).upper()[0] != 'W':
-                    color, card = trigger.group(0)[:1].upper(), trigger.group(0)[1:].upper()
-                else:
-                    color, card = trigger.group(0)[:-1].upper(), trigger.group(0)[-1:].upper()
-
-            # some gymnastics to support both '.play r d2' and '.play d2 r'
-            if color not in CARD_COLORS:
-                color, card = card, color
-            elif card not in (COLORED_CARD_NUMS + SPECIAL_CARDS):
-                color, card = card, color
-            if color in CARD_COLORS and card in (COLORED_CARD_NUMS + SPECIAL_CARDS):
-                if card in SPECIAL_CARDS:
-                    searchcard = card
-                else:
-                    searchcard = color + card
-            else:  # raise InvalidCardError to indicate that arguments were not valid
-                raise InvalidCardError("Card color or value invalid")
-        except (AttributeError, InvalidCardError):  # insufficient arguments or invalid card
-            bot.notice(STRINGS['PLAY_SYNTAX'].replace('%p', bot.config.core.help_prefix), trigger.nick)
-            return
+        if len(trigger.groups()) > 1:
+            spelling = ((trigger.group(3) or '').upper(), (trigger.group(4) or '').upper())
+        else:
+            spelling = trigger.group(0).upper()
+        searchcard, playcard = PLAY_SPELLINGS.get(spelling, (None, None))
 
         with lock:
+            if not self.deck:
+                return
+            if trigger.nick not in self.players:
+                bot.notice(STRINGS['NOT_PLAYING'], trigger.nick)
+                return
+            if trigger.nick != self.playerOrder[self.currentPlayer]:
+                self.tell(bot, STRINGS['ON_TURN'] % self.playerOrder[self.currentPlayer], trigger.nick)
+                return
+            if searchcard is None:  # insufficient arguments or invalid card
+                bot.notice(STRINGS['PLAY_SYNTAX'].replace('%p', bot.config.core.help_prefix), trigger.nick)
+                return
+
             pl = self.currentPlayer
             if searchcard not in self.players[self.playerOrder[pl]]:
                 bot.notice(STRINGS['DONT_HAVE'], self.playerOrder[pl])
                 return
-            playcard = color + card
             if not self.card_playable(playcard):
                 bot.notice(STRINGS['DOESNT_PLAY'],
                            self.playerOrder[pl])
@@ -260,7 +718,9 @@ class UnoGame:
                            self.playerOrder[pl])
                 return
             self.drawn = NO
+            self.record('play', nick=self.playerOrder[pl], card=playcard)
             self.players[self.playerOrder[pl]].remove(searchcard)
+            self.discarded += 1  # the old top card
             hand_size = len(self.players[self.playerOrder[pl]])
             if hand_size < self.smallestHand:
                 self.smallestHand = hand_size
@@ -275,47 +735,50 @@ class UnoGame:
             self.show_on_turn(bot)
 
     def draw(self, bot, trigger):
-        if not self.deck:
-            return
-        if trigger.nick not in self.players:
-            bot.notice(STRINGS['NOT_PLAYING'], trigger.nick)
-            return
-        if trigger.nick != self.playerOrder[self.currentPlayer]:
-            bot.say(STRINGS['ON_TURN'] % self.playerOrder[self.currentPlayer])
-            return
         with lock:
+            if not self.deck:
+                return
+            if trigger.nick not in self.players:
+                bot.notice(STRINGS['NOT_PLAYING'], trigger.nick)
+                return
+            if trigger.nick != self.playerOrder[self.currentPlayer]:
+                self.tell(bot, STRINGS['ON_TURN'] % self.playerOrder[self.currentPlayer], trigger.nick)
+                return
             if self.drawn:
                 bot.notice(STRINGS['DRAWN_ALREADY'],
                            self.playerOrder[self.currentPlayer])
                 return
+            self.record('draw', nick=self.playerOrder[self.currentPlayer])
             c = self.get_card()
             self.drawn = c
             self.players[self.playerOrder[self.currentPlayer]].append(c)
-        bot.notice(STRINGS['DRAWN_CARD'] % self.render_cards(bot, [c], trigger.nick), trigger.nick)
+        if trigger.nick not in self.aiPlayers:
+            bot.notice(STRINGS['DRAWN_CARD'] % self.render_cards(bot, [c], trigger.nick), trigger.nick)
 
     def pass_(self, bot, trigger):
-        if not self.deck:
-            return
-        if trigger.nick not in self.players:
-            bot.notice(STRINGS['NOT_PLAYING'], trigger.nick)
-            return
         with lock:
+            if not self.deck:
+                return
+            if trigger.nick not in self.players:
+                bot.notice(STRINGS['NOT_PLAYING'], trigger.nick)
+                return
             if trigger.nick != self.playerOrder[self.currentPlayer]:
-                bot.say(STRINGS['ON_TURN'] % self.playerOrder[self.currentPlayer])
+                self.tell(bot, STRINGS['ON_TURN'] % self.playerOrder[self.currentPlayer], trigger.nick)
                 return
             if not self.drawn:
                 bot.notice(STRINGS['DRAW_FIRST'],
                            self.playerOrder[self.currentPlayer])
                 return
             self.drawn = NO
+            self.record('pass', nick=self.playerOrder[self.currentPlayer])
             bot.say(STRINGS['PASSED'] % self.playerOrder[self.currentPlayer])
             self.inc_player()
-        self.show_on_turn(bot)
+            self.show_on_turn(bot)
 
     def fml(self, bot, trigger):
-        if not self.deck or trigger.nick not in self.players:
-            return
         with lock:
+            if not self.deck or trigger.nick not in self.players:
+                return
             if trigger.nick != self.playerOrder[self.currentPlayer]:
                 return
             if self.drawn:
@@ -327,7 +790,8 @@ class UnoGame:
         with lock:
             pl = self.playerOrder[self.currentPlayer]
             bot.say(STRINGS['TOP_CARD'] % (pl, self.render_cards(bot, [self.topCard], pl)))
-            self.send_cards(bot, self.playerOrder[self.currentPlayer], True)
+            if pl not in self.aiPlayers:
+                self.send_cards(bot, pl, True)
 
     def send_cards(self, bot, who, withNext=False):
         with lock:
@@ -338,42 +802,77 @@ class UnoGame:
                 bot.notice(STRINGS['NOT_PLAYING'], who)
                 return
             cards = self.players[who]
-            msg = STRINGS['YOUR_CARDS'] % (len(cards), self.render_cards(bot, cards, who))
+            shown = self.shownHands.get(who)
+            if withNext and shown is not None and UnoBot.get_hand_mode(bot, who) == HAND_DELTA:
+                msg = STRINGS['YOUR_CARDS'] % (len(cards), self.render_delta(bot, shown, cards, who))
+            else:
+                msg = STRINGS['YOUR_CARDS'] % (len(cards), self.render_cards(bot, cards, who))
+            self.shownHands[who] = list(cards)
             if withNext:
                 msg += " - " + STRINGS['NEXT_START'] + self.render_counts()
+                if getattr(bot, 'throttled', NO):  # the TOP_CARD line in channel may take a while to come out
+                    msg = STRINGS['TOP_CARD_NOTICE'] % self.render_cards(bot, [self.topCard], who) + " - " + msg
             bot.notice(msg, who)
 
-    def send_counts(self, bot):
+    def send_counts(self, bot, who=None):
         if self.startTime:
-            bot.say(STRINGS['SB_START'] + self.render_counts(YES))
+            self.tell(bot, STRINGS['SB_START'] + self.render_counts(YES), who)
         else:
-            bot.say(STRINGS['NOT_STARTED'])
+            self.tell(bot, STRINGS['NOT_STARTED'], who)
+
+    @staticmethod
+    def tell(bot, message, who):
+        """
+        Answer `who` in the channel, or with a notice if the channel's lines are being throttled (at a tournament table),
+        where the answer could arrive too late to be any use.
+        """
+        if who is not None and getattr(bot, 'throttled', NO):
+            bot.notice(message, who)
+        else:
+            bot.say(message)
 
     def render_counts(self, full=NO):
         with lock:
             if full:
-                stop = len(self.players)
-                inc = abs(self.way)
-                plr = 0
-            else:
-                stop = self.currentPlayer
-                inc = self.way
-                plr = stop + inc
-                if plr == len(self.players):
-                    plr = 0
-                if plr < 0:
-                    plr = len(self.players) - 1
-            arr = []
-            while plr != stop:
-                cards = len(self.players[self.playerOrder[plr]])
-                arr.append(STRINGS['SB_PLAYER'] % (self.playerOrder[plr], cards))
-                plr += inc
-                if plr == len(self.players) and not full:
-                    plr = 0
-                if plr < 0:
-                    plr = len(self.players) - 1
+                return ' - '.join(self.standing(nick) for nick in self.playerOrder)
+            # everyone but the current player, starting with whoever is next
+            seats = len(self.playerOrder)
+            order = [self.playerOrder[(self.currentPlayer + self.way * i) % seats] for i in range(1, seats)]
+            if len(order) <= NEXT_LIST_MAX:
+                return ' - '.join(self.standing(nick) for nick in order)
+            rest = order[NEXT_SUMMARY_PLAYERS:]
+            fewest = min(rest, key=lambda nick: len(self.players[nick]))
+            arr = [self.standing(nick) for nick in order[:NEXT_SUMMARY_PLAYERS]]
+            arr.append(STRINGS['NEXT_MORE'] % (len(rest), self.standing(fewest)))
         return ' - '.join(arr)
 
+    def standing(self, nick):
+        """
+        `nick`'s piece of the standings, e.g. "nick (5)". Rendered again only when their hand size has changed.
+        """
+        with lock:
+            count = len(self.players[nick])
+            entry = self.standings.get(nick)
+            if entry is None or entry[0] != count:
+                entry = self.standings[nick] = (count, STRINGS['SB_PLAYER'] % (nick, count))
+        return entry[1]
+
+    @staticmethod
+    def render_delta(bot, shown, cards, who):
+        gained = list(cards)
+        lost = []
+        for card in shown:
+            if card in gained:
+                gained.remove(card)
+            else:
+                lost.append(card)
+        parts = []
+        if gained:
+            parts.append('+' + UnoGame.render_cards(bot, gained, who))
+        if lost:
+            parts.append('-' + UnoGame.render_cards(bot, lost, who))
+        return ' '.join(parts) or STRINGS['NO_CHANGE']
+
     @staticmethod
     def render_cards(bot, cards, who):
         cards = sorted(cards)
@@ -449,6 +948,22 @@ class UnoGame:
             return ((card[0] == self.topCard[0]) or
                     (card[1] == self.topCard[1])) and ('W' not in card)
 
+    def legal_plays(self):
+        """
+        Every (card in hand, card as played) move open to the current player right now, with wilds once per color.
+        """
+        with lock:
+            plays = []
+            for card in sorted(set(self.players[self.playerOrder[self.currentPlayer]])):
+                if card in SPECIAL_CARDS:
+                    candidates = [(card, color + card) for color in CARD_COLORS]
+                else:
+                    candidates = [(card, card)]
+                for searchcard, playcard in candidates:
+                    if self.card_playable(playcard) and not self.card_reneges(playcard):
+                        plays.append((searchcard, playcard))
+        return plays
+
     def card_reneges(self, card):
         if self.drawn and card != self.drawn:
             if card[1:] == self.drawn:
@@ -460,19 +975,20 @@ class UnoGame:
 
     def card_played(self, bot, card):
         with lock:
+            # the card goes on the pile first, so a reshuffle while penalty cards are drawn can't put it back in the deck
+            self.topCard = card
             pl = self.playerOrder[self.currentPlayer]
             if 'D2' in card:
                 bot.say(STRINGS['D2'] % pl)
-                z = [self.get_card(), self.get_card()]
-                bot.notice(STRINGS['CARDS'] % self.render_cards(bot, z, pl), pl)
-                self.players[pl].extend(z)
+                z = self.draw_cards(pl, 2)
+                if pl not in self.aiPlayers:
+                    bot.notice(STRINGS['CARDS'] % self.render_cards(bot, z, pl), pl)
                 self.inc_player()
             elif 'WD4' in card:
                 bot.say(STRINGS['WD4'] % pl)
-                z = [self.get_card(), self.get_card(), self.get_card(),
-                     self.get_card()]
-                bot.notice(STRINGS['CARDS'] % self.render_cards(bot, z, pl), pl)
-                self.players[pl].extend(z)
+                z = self.draw_cards(pl, 4)
+                if pl not in self.aiPlayers:
+                    bot.notice(STRINGS['CARDS'] % self.render_cards(bot, z, pl), pl)
                 self.inc_player()
             elif 'S' in card or (len(self.playerOrder) == 2 and card[1] == 'R' and 'W' not in card):  # issue #25
                 bot.say(STRINGS['SKIPPED'] % pl)
@@ -482,35 +998,50 @@ class UnoGame:
                 self.way = -self.way
                 self.inc_player()
                 self.inc_player()
-            self.topCard = card
+
+    def draw_cards(self, who, count):
+        drawn = []
+        with lock:
+            for i in range(count):
+                # into the hand one at a time, so each is accounted for if the next one triggers a reshuffle
+                drawn.append(self.get_card())
+                self.players[who].append(drawn[-1])
+        return drawn
 
     def get_card(self):
         with lock:
             ret = self.deck.pop(0)
             if not self.deck:
-                self.deck = self.create_deck()
+                self.deck = self.create_deck(ret)
+                self.shownHands.clear()  # everyone gets their full hand again after a reshuffle
         return ret
 
-    def create_deck(self):
-        new_deck = []
-        for card in (COLORED_CARD_NUMS + COLORED_CARD_NUMS[1:]):
-            for color in CARD_COLORS:
-                new_deck.append(color + card)
-        for card in SPECIAL_CARDS:
-            new_deck.extend([card] * 4)
-
-        new_deck *= 2
+    def create_deck(self, held=None):
+        new_deck = list(FULL_DECK)
 
         if self.dealt:  # don't filter the deck if no cards have been dealt yet
-            new_deck.remove(self.topCard)
-            for hand in self.players:
+            # played wilds carry their chosen color, e.g. 'RWD4'; the deck only knows the bare card
+            new_deck.remove(self.topCard[1:] if 'W' in self.topCard[1:] else self.topCard)
+            for hand in list(self.players.values()) + list(self.deadPlayers.values()):
                 for card in hand:
                     new_deck.remove(card)
+            if held:  # just drawn, but not in anyone's hand yet
+                new_deck.remove(held)
 
-        random.shuffle(new_deck)
-        random.shuffle(new_deck)
+        self.next_rng().shuffle(new_deck)
+        self.discarded = 0
         return new_deck
 
+    def next_rng(self):
+        """
+        A generator derived from the game's seed and how many have been handed out before it. Only needed at deal and
+        reshuffle time, so games don't keep a full generator state around between them.
+        """
+        with lock:
+            rng = random.Random((self.seed << 20) | self.draws)
+            self.draws += 1
+        return rng
+
     def inc_player(self):
         with lock:
             self.previousPlayer = self.currentPlayer
@@ -521,18 +1052,22 @@ class UnoGame:
                 self.currentPlayer = len(self.players) - 1
 
     def remove_player(self, bot, player):
-        if len(self.players) == 1:
-            return STOP
-        if player not in self.players:
-            return
         with lock:
+            if len(self.players) == 1:
+                return STOP
+            if player not in self.players:
+                return
             pl = self.playerOrder.index(player)
             removedPlayer = self.players.pop(player)
             self.playerOrder.remove(player)
+            self.shownHands.pop(player, None)
+            self.standings.pop(player, None)
+            self.aiPlayers.discard(player)
             if self.startTime:
-                self.deadPlayers[player] = removedPlayer  # issue 49
+                # issue 49; add to any hand already saved under this nick (e.g. a player who had it before)
+                self.deadPlayers.setdefault(player, []).extend(removedPlayer)
                 if player == self.owner:
-                    self.owner = self.playerOrder[0]
+                    self.owner = next((p for p in self.playerOrder if p not in self.aiPlayers), self.playerOrder[0])
                     if len(self.players) > 1:
                         bot.say(STRINGS['OWNER_LEFT'] % self.owner)
                     else:
@@ -553,167 +1088,1532 @@ class UnoGame:
                     return STOP
             else:
                 if player == self.owner:
-                    self.owner = self.playerOrder[0]
+                    self.owner = next((p for p in self.playerOrder if p not in self.aiPlayers), self.playerOrder[0])
                     bot.say(STRINGS['OWNER_LEFT'] % self.owner)
 
     def nick_change(self, bot, trigger):
         old = trigger.nick
         new = tools.Identifier(trigger)
-        if old not in self.players:
-            return
         with lock:
+            if old not in self.players:
+                return
+            if new in self.players:
+                # something they said as `new` was handled before this NICK and dealt them in a second time: keep
+                # that seat and give up the old one
+                self.record('quit', nick=old)
+                return self.remove_player(bot, old)
             idx = self.playerOrder.index(old)
+            self.record('nick', old=old, new=new)
             self.players[new] = self.players.pop(old)
             self.playerOrder[idx] = new
+            if old in self.shownHands:
+                self.shownHands[new] = self.shownHands.pop(old)
+            self.standings.pop(old, None)
+            if old in self.aiPlayers:
+                self.aiPlayers.remove(old)
+                self.aiPlayers.add(new)
             if self.owner == old:
                 self.owner = new
             bot.notice(STRINGS['NICK_CHANGED'] % (old, new, self.channel), new)
 
     def game_moved(self, bot, who, oldchan, newchan):
         with lock:
+            self.record('move', by=who, channel=newchan)
             self.channel = newchan
             bot.msg(self.channel, STRINGS['MOVED_FROM'] % (who, oldchan))
-            for player in self.players:
-                bot.notice(STRINGS['GAME_MOVED'] % (oldchan, newchan), player)
+            notice_many(bot, STRINGS['GAME_MOVED'] % (oldchan, newchan),
+                        [p for p in self.playerOrder if p not in self.aiPlayers])
             bot.msg(oldchan, STRINGS['GAME_MOVED'] % (oldchan, newchan))
 
 
+class ScoreRecord(object):
+    """
+    One player's accumulated totals. Stored as a plain JSON object in the score file, but kept in memory as a slotted
+    record so large score tables don't carry a dict per player.
+    """
+    __slots__ = ('games', 'wins', 'points', 'playtime')
+
+    def __init__(self, games=0, wins=0, points=0, playtime=0):
+        self.games = games
+        self.wins = wins
+        self.points = points
+        self.playtime = playtime
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d.get('games', 0), d.get('wins', 0), d.get('points', 0), d.get('playtime', 0))
+
+    def to_dict(self):
+        return {'games': self.games, 'wins': self.wins, 'points': self.points, 'playtime': self.playtime}
+
+    @classmethod
+    def load_table(cls, data):
+        return dict((nick, cls.from_dict(d)) for (nick, d) in data.items())
+
+    @staticmethod
+    def dump_table(scores):
+        return dict((nick, record.to_dict()) for (nick, record) in scores.items())
+
+    def merge(self, other):
+        self.games += other.games
+        self.wins += other.wins
+        self.points += other.points
+        self.playtime += other.playtime
+
+
+SCORE_FIELDS = ('games', 'wins', 'points', 'playtime')
+
+
+class _JSONChunkReader(object):
+    """
+    Reads JSON tokens from a file a chunk at a time, keeping only the unconsumed tail of the data in memory.
+    """
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+
+    def _fill(self):
+        more = self.f.read(self.chunk_size)
+        self.buf = self.buf[self.pos:] + more
+        self.pos = 0
+        return bool(more)
+
+    def peek(self):
+        """
+        The next non-whitespace character, or '' at the end of the file.
+        """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected %r in score file" % char)
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, self.pos = self.decoder.raw_decode(self.buf, self.pos)
+                return value
+            except ValueError:
+                if not self._fill():
+                    raise
+
+
+def iter_score_file(path, chunk_size=65536):
+    """
+    Yield (nick, ScoreRecord) pairs from a JSON score file one entry at a time, without loading the whole object.
+    """
+    with open(path) as scorefile:
+        reader = _JSONChunkReader(scorefile, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            nick = reader.value()
+            reader.expect(':')
+            yield nick, ScoreRecord.from_dict(reader.value())
+            if reader.peek() != ',':
+                break
+            reader.expect(',')
+        reader.expect('}')
+
+
+def iter_legacy_score_file(path):
+    """
+    Yield (nick, ScoreRecord) pairs from the old space-separated "nick games wins points [playtime]" format.
+    """
+    with open(path) as scorefile:
+        for line in scorefile:
+            tokens = line.replace('\n', '').split(' ')
+            if len(tokens) < 4:
+                continue
+            if len(tokens) == 4:
+                tokens.append(0)
+            yield tools.Identifier(tokens[0]), ScoreRecord(
+                int(tokens[1]), int(tokens[2]), int(tokens[3]), int(tokens[4]))
+
+
+def iter_score_export(path, fmt=None):
+    """
+    Yield (nick, ScoreRecord) pairs from any format scores can be exported in, or either score file format. The format
+    comes from the file extension unless given.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt == 'csv':
+        with open(path) as infile:
+            for row in csv.DictReader(infile):
+                yield row['nick'], ScoreRecord(*[int(row.get(field) or 0) for field in SCORE_FIELDS])
+    elif fmt == 'jsonl':
+        with open(path) as infile:
+            for line in infile:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry['nick'], ScoreRecord.from_dict(entry)
+    else:
+        with open(path) as infile:
+            first = infile.read(64).lstrip()[:1]
+        for entry in (iter_score_file if first == '{' else iter_legacy_score_file)(path):
+            yield entry
+
+
+def write_score_file(path, entries):
+    """
+    Stream (nick, ScoreRecord) pairs into a JSON score file. The data goes to a temporary file that then replaces
+    `path`, so readers only ever see the old or the new file.
+    """
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    encode = json.JSONEncoder().encode
+    try:
+        with open(tmp, 'w') as scorefile:
+            sep = '{'
+            for nick, record in entries:
+                scorefile.write('%s%s: %s' % (sep, encode(nick), encode(record.to_dict())))
+                sep = ', '
+            scorefile.write('}' if sep == ', ' else '{}')
+        replace_file(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_score_export(path, entries, fmt=None):
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    count = 0
+    with open(tmp, 'w') as outfile:
+        if fmt == 'csv':
+            writer = csv.writer(outfile)
+            writer.writerow(('nick',) + SCORE_FIELDS)
+            for nick, record in entries:
+                writer.writerow((nick, record.games, record.wins, record.points, record.playtime))
+                count += 1
+        else:
+            for nick, record in entries:
+                entry = record.to_dict()
+                entry['nick'] = nick
+                outfile.write(json.dumps(entry, sort_keys=True) + '\n')
+                count += 1
+    replace_file(tmp, path)
+    return count
+
+
+def merge_score_entries(*sources):
+    """
+    Sum entries from any number of (nick, ScoreRecord) iterables, treating nicks that are equal as IRC identifiers as
+    the same player. The first spelling seen for a nick is kept. Holds one record per distinct player.
+    """
+    merged = {}
+    spelling = {}
+    for source in sources:
+        for nick, record in source:
+            key = tools.Identifier(nick).lower()
+            if key in merged:
+                merged[key].merge(record)
+            else:
+                merged[key] = record
+                spelling[key] = str(nick)
+    return [(spelling[key], merged[key]) for key in merged]
+
+
+class ScoreFileLock(object):
+    """
+    Reentrant lock held while reading, changing and rewriting score data. Besides the threads in this process it
+    excludes every other process using the same lock file, via flock(). Where fcntl isn't available (Windows) only
+    threads in this process are excluded.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth == 1 and fcntl is not None:
+            try:
+                self._file = open(self.path, 'a')
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except Exception:
+                self._release()
+                raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self._release()
+
+    def _release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+
+def file_stamp(path):
+    """
+    Identifies one version of a file that is only ever replaced whole; None if it doesn't exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, getattr(st, 'st_mtime_ns', st.st_mtime))
+
+
+def replace_file(src, dest):
+    if hasattr(os, 'replace'):
+        os.replace(src, dest)
+    else:  # Python 2; rename is atomic on POSIX, and Windows can't replace an open file anyway
+        if os.name == 'nt' and os.path.exists(dest):
+            os.remove(dest)
+        os.rename(src, dest)
+
+
+# per-game event logs older than this many days are folded into the monthly history files and removed
+LOG_KEEP_DAYS = 30
+
+
+class GameLog(object):
+    """
+    Writes each game's events as JSON Lines to its own file in `logdir`. Events are buffered in memory and handed to
+    a background thread in batches, per game, once FLUSH_EVERY events are pending or when the game ends, so no game
+    waits on log file I/O.
+
+    Once a day the writer folds per-game logs older than `keep_days` into `history-YYYY-MM.jsonl`, keeping only each
+    game's result (what the analytics need), and removes them.
+    """
+    FLUSH_EVERY = 256
+    PRUNE_EVERY = 86400
+
+    def __init__(self, logdir, keep_days=LOG_KEEP_DAYS):
+        self.logdir = logdir
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        self._buffers = {}
+        self._pending = 0
+        self._encode = json.JSONEncoder(separators=(',', ':')).encode
+        self._next_prune = 0
+        self._serial = itertools.count()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='UnoBot game log writer')
+        self.thread.daemon = True
+        self.thread.start()
+        metrics.gauges['log_queue_depth'] = self.queue.qsize
+
+    def path_for(self, game):
+        # other bot processes may share the directory, and games can start within the same second
+        name = re.sub(r'[^\w.-]', '_', '%s-%s-%d-%d' % (
+            game.channel, datetime.now().strftime('%Y%m%d%H%M%S'), os.getpid(), next(self._serial)))
+        return os.path.join(self.logdir, name + '.jsonl')
+
+    def record(self, game, event):
+        with self._lock:
+            buf = self._buffers.get(game)
+            if buf is None:
+                buf = self._buffers[game] = [self.path_for(game)]
+            buf.append(self._encode(event))
+            self._pending += 1
+            if self._pending >= self.FLUSH_EVERY:
+                self._hand_off()
+
+    def close(self, game):
+        with self._lock:
+            buf = self._buffers.pop(game, None)
+            if buf is not None and len(buf) > 1:
+                self.queue.put([buf])
+
+    def flush(self):
+        """
+        Write out everything recorded so far, and wait until it has been.
+        """
+        with self._lock:
+            self._hand_off()
+        self.queue.join()
+
+    def stop(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    def _hand_off(self):
+        batch = []
+        for buf in self._buffers.values():
+            if len(buf) > 1:
+                batch.append(list(buf))
+                del buf[1:]
+        if batch:
+            self.queue.put(batch)
+        self._pending = 0
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            try:
+                if batch is None:
+                    return
+                for buf in batch:
+                    self._write(buf)
+                if time.time() >= self._next_prune:
+                    self._next_prune = time.time() + self.PRUNE_EVERY
+                    self.prune()
+            except Exception:
+                LOGGER.exception('Error writing UNO game logs')
+            finally:
+                self.queue.task_done()
+
+    def _write(self, buf):
+        if not os.path.isdir(self.logdir):
+            os.makedirs(self.logdir)
+        with open(buf[0], 'a') as logfile:
+            logfile.write('\n'.join(buf[1:]) + '\n')
+
+    def prune(self, now=None):
+        """
+        Fold per-game logs last written more than `keep_days` ago into the monthly history files. Returns how many
+        were removed.
+        """
+        cutoff = (now or time.time()) - self.keep_days * 86400
+        with self._lock:
+            live = set(buf[0] for buf in self._buffers.values())
+        removed = 0
+        if not os.path.isdir(self.logdir):
+            return removed
+        for name in sorted(os.listdir(self.logdir)):
+            path = os.path.join(self.logdir, name)
+            if not name.endswith('.jsonl') or name.startswith('history-') or path in live:
+                continue
+            if os.path.getmtime(path) >= cutoff:
+                continue
+            result = game_result(read_game_log(path))
+            if result is not None:
+                month = datetime.fromtimestamp(result['ts']).strftime('%Y-%m')
+                with open(os.path.join(self.logdir, 'history-%s.jsonl' % month), 'a') as history:
+                    history.write(self._encode(result) + '\n')
+            os.remove(path)
+            removed += 1
+        return removed
+
+
+def read_game_log(path):
+    with open(path) as logfile:
+        for line in logfile:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Leaderboards(object):
+    """
+    Score tables per time window (daily, weekly) and per channel, kept up to date one game at a time instead of
+    being rebuilt from history. The all-time global board is the score file itself and isn't duplicated here.
+
+    Tables are keyed by (window, period, scope), where scope is a case-folded channel name or '*' for every channel.
+    Periods older than KEEP[window] roll off as new ones start.
+    """
+    WINDOWS = ('daily', 'weekly', 'all')
+    KEEP = {'daily': 14, 'weekly': 8}
+    ALL_SCOPES = '*'
+
+    def __init__(self, path=None):
+        self.path = path
+        self.tables = {}
+        self._lock = threading.RLock()
+        self._stamp = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Reload the boards if another process has saved them since we last read or wrote the file.
+        """
+        stamp = file_stamp(self.path) if self.path else None
+        with self._lock:
+            if stamp is None or stamp == self._stamp:
+                return
+            with open(self.path) as boardfile:
+                self.tables = self.load(json.load(boardfile))
+            self._stamp = stamp
+
+    @staticmethod
+    def period(window, when):
+        if window == 'daily':
+            return when.strftime('%Y-%m-%d')
+        if window == 'weekly':
+            year, week, _ = when.isocalendar()
+            return '%d-W%02d' % (year, week)
+        return 'all'
+
+    @staticmethod
+    def describe(window, channel=None):
+        label = {'daily': 'today', 'weekly': 'this week', 'all': ''}[window]
+        if channel:
+            label += ' in %s' % channel
+        return label.strip()
+
+    @classmethod
+    def scope(cls, channel=None):
+        """
+        What a channel's tables are stored under: its name as IRC compares it, since Sopel passes on whatever case the
+        server relays and `unomove` takes whatever the user typed.
+        """
+        return str(tools.Identifier(channel).lower()) if channel else cls.ALL_SCOPES
+
+    def table(self, window, channel=None, when=None):
+        self.refresh()
+        with self._lock:
+            return dict(self.tables.get((window, self.period(window, when or datetime.now()), self.scope(channel)), {}))
+
+    def add_game(self, channel, players, winner, score, time, when=None):
+        channel = self.scope(channel) if channel else None
+        with self._lock:
+            self._add_game(channel, players, winner, score, time, when or datetime.now())
+
+    def keys(self, channel, when):
+        """
+        The (window, period, scope) tables a game finished in `channel` at `when` counts towards.
+        """
+        keys = []
+        channel = self.scope(channel) if channel else None
+        for window in self.KEEP:
+            period = self.period(window, when)
+            keys.append((window, period, self.ALL_SCOPES))
+            if channel:
+                keys.append((window, period, channel))
+        if channel:
+            keys.append(('all', 'all', channel))
+        return keys
+
+    def points(self, key, nick):
+        with self._lock:
+            record = self.tables.get(key, {}).get(nick)
+        return record.points if record else 0
+
+    def _add_game(self, channel, players, winner, score, time, when):
+        keys = self.keys(channel, when)
+        new_period = any(key not in self.tables for key in keys if key[2] == self.ALL_SCOPES)
+        for key in keys:
+            table = self.tables.setdefault(key, {})
+            for pl in players:
+                record = table.get(pl)
+                if record is None:
+                    record = table[pl] = ScoreRecord()
+                record.games += 1
+                record.playtime += time
+            table[winner].wins += 1
+            table[winner].points += score
+        if new_period:
+            self.expire()
+
+    def expire(self):
+        for window, keep in self.KEEP.items():
+            periods = sorted(set(p for (w, p, _) in self.tables if w == window))
+            for period in periods[:-keep]:
+                for key in [k for k in self.tables if k[0] == window and k[1] == period]:
+                    del self.tables[key]
+
+    @staticmethod
+    def load(data):
+        tables = {}
+        for window, periods in data.items():
+            for period, scopes in periods.items():
+                for scope, table in scopes.items():
+                    tables[(window, period, scope)] = ScoreRecord.load_table(table)
+        return tables
+
+    def dump(self):
+        data = {}
+        for (window, period, scope), table in self.tables.items():
+            data.setdefault(window, {}).setdefault(period, {})[scope] = ScoreRecord.dump_table(table)
+        return data
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with self._lock:
+            with open(tmp, 'w') as boardfile:
+                json.dump(self.dump(), boardfile)
+            replace_file(tmp, self.path)
+            self._stamp = file_stamp(self.path)
+
+
+class ScoreWriter(object):
+    """
+    Applies finished games' results to the score file on a background thread, strictly in the order they finished,
+    so the winning `play` doesn't wait on score file I/O. Results it can't get to (the queue is full, or the bot is
+    shutting down) are saved to `<scorefile>.pending` and applied by resume() when the bot next starts.
+    """
+    QUEUE_SIZE = 1024
+    # submit() is called with the game lock held, so never wait longer than this for room in the queue
+    SUBMIT_TIMEOUT = 5.0
+    # how long close() lets the writer work through the queue before saving what's left for next time
+    CLOSE_TIMEOUT = 30.0
+
+    def __init__(self, unobot):
+        self.unobot = unobot
+        self.pendingFile = unobot.scoreFile + '.pending'
+        self.queue = queue.Queue(self.QUEUE_SIZE)
+        self.thread = threading.Thread(target=self._run, name='UnoBot score writer')
+        self.thread.daemon = True
+        self.thread.start()
+        metrics.gauges['score_queue_depth'] = self.queue.qsize
+
+    def submit(self, bot, *result):
+        # waits a little if the writer has fallen QUEUE_SIZE games behind; if it's stuck, the result is saved for the
+        # next start instead of the whole bot hanging on the game lock
+        try:
+            self.queue.put((bot, result), timeout=self.SUBMIT_TIMEOUT)
+        except queue.Full:
+            LOGGER.error('UNO score writer is not keeping up; result saved to %s', self.pendingFile)
+            self.save_pending([result])
+            return NO
+        return YES
+
+    def close(self):
+        """
+        Apply everything still queued, then stop the thread. If the writer can't finish within CLOSE_TIMEOUT, what it
+        hasn't started on is saved for the next start.
+        """
+        try:
+            self.queue.put(None, timeout=self.SUBMIT_TIMEOUT)
+        except queue.Full:
+            pass
+        else:
+            self.thread.join(self.CLOSE_TIMEOUT)
+        if self.thread.is_alive():
+            left = []
+            while True:
+                try:
+                    job = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    left.append(job[1])
+            if left:
+                LOGGER.error('UNO score writer did not finish; %d results saved to %s', len(left), self.pendingFile)
+                self.save_pending(left)
+
+    def save_pending(self, results):
+        with open(self.pendingFile, 'a') as pending:
+            for players, winner, score, elapsed, channel in results:
+                pending.write(json.dumps([[str(pl) for pl in players], str(winner), score, elapsed,
+                                          str(channel) if channel else None]) + '\n')
+
+    def resume(self, bot):
+        """
+        Apply the results an earlier run saved to the pending file, before any new game can finish. Returns how many
+        there were.
+        """
+        # take the file first, so another bot process sharing the homedir can't apply the same results again
+        taken = '%s.%d' % (self.pendingFile, os.getpid())
+        try:
+            os.rename(self.pendingFile, taken)
+        except OSError:
+            return 0
+        results = []
+        with open(taken) as pending:
+            for line in pending:
+                try:
+                    results.append(json.loads(line))
+                except ValueError:  # cut short by a crash mid-write
+                    LOGGER.error('Skipping damaged line in %s: %r', self.pendingFile, line)
+        for result in results:
+            self.unobot.update_scores(bot, *result)
+        os.remove(taken)
+        return len(results)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            bot, result = job
+            start = timer()
+            try:
+                self.unobot.update_scores(bot, *result)
+            except Exception as e:
+                LOGGER.exception('Error recording UNO result %r', result)
+                try:
+                    bot.say("UNO score error: %s" % e)
+                except Exception:
+                    pass  # already logged; the writer has to keep going
+            metrics.observe('score_update', timer() - start)
+
+
+# rendered .unotop lists and .unorank lines kept at once; the least recently shown go first
+RENDER_CACHE_SIZE = 512
+
+
+class RenderCache(object):
+    """
+    LRU cache of rendered leaderboard output, keyed by ('top', board, None) or ('rank', board, nick), where `board`
+    is a Leaderboards key. Top lists are stored as (lines, nicks shown, lowest points shown) and rank lines as (lines,
+    the player's points), which is what invalidate() needs to tell whether a game could have changed them.
+    """
+    def __init__(self, size=RENDER_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.generation = 0  # bumped on every invalidation, so a render started before one isn't stored after it
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def board(key):
+        """
+        A Leaderboards key with the channel case-folded as the boards store it, so '#UNO' and '#uno' share entries.
+        """
+        window, period, scope = key
+        return window, period, Leaderboards.scope(scope)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=NO)
+
+    def invalidate(self, board, players, old, new):
+        """
+        Forget what a game on `board` could have changed: top lists showing one of its `players` or that the winner,
+        going from `old` to `new` points, could have broken into; rank lines of its players, and of anyone whose
+        points the winner reached or passed.
+        """
+        with self._lock:
+            self.generation += 1
+            for key in list(self._entries):
+                if key[1] != board:
+                    continue
+                entry = self._entries[key]
+                if key[0] == 'top':
+                    stale = entry[1] & players or new >= entry[2]
+                else:
+                    stale = key[2] in players or (entry[1] is not None and old <= entry[1] <= new)
+                if stale:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return 100 * self.hits // lookups if lookups else 0
+
+
+class ScoreAnalytics(object):
+    """
+    Batch statistics over the whole score table, plus the game history in the event logs if there is one, computed
+    column-wise with NumPy: distribution percentiles, win rates with Wilson 95% confidence intervals, Elo ratings
+    and per-channel breakdowns.
+    """
+    PERCENTILES = (50, 90, 99)
+    ELO_START = 1500.0
+    ELO_K = 32.0
+    Z95 = 1.959964
+
+    def __init__(self, entries, history=()):
+        entries = list(entries)
+        self.nicks = [str(nick) for nick, _ in entries]
+        self.index = dict((nick, i) for (i, nick) in enumerate(self.nicks))
+        table = numpy.array([[r.games, r.wins, r.points, r.playtime] for _, r in entries], dtype=numpy.float64)
+        table = table.reshape(-1, 4)
+        self.games, self.wins, self.points, self.playtime = table.T
+        self.pts_per_sec = self.points / numpy.maximum(self.playtime, 1)
+        self.pts_per_game = self.points / numpy.maximum(self.games, 1)
+        self.pts_per_win = numpy.where(self.wins > 0, self.points / numpy.maximum(self.wins, 1), 0.0)
+        self.win_rate = self.wins / numpy.maximum(self.games, 1)
+        self.win_low, self.win_high = self.wilson(self.wins, self.games)
+        self.rank = numpy.empty(len(self.nicks), dtype=numpy.int64)
+        self.rank[numpy.argsort(-self.points, kind='stable')] = numpy.arange(1, len(self.nicks) + 1)
+        self.elo = numpy.full(len(self.nicks), self.ELO_START)
+        self.channels = {}
+        self.history_games = 0
+        self._load_history(history)
+
+    @classmethod
+    def wilson(cls, wins, games):
+        n = numpy.maximum(games, 1)
+        p = wins / n
+        z2 = cls.Z95 ** 2
+        centre = (p + z2 / (2 * n)) / (1 + z2 / n)
+        spread = cls.Z95 * numpy.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / (1 + z2 / n)
+        return numpy.clip(centre - spread, 0, 1), numpy.clip(centre + spread, 0, 1)
+
+    def _load_history(self, history):
+        channel_stats = {}
+        for game in history:
+            seats = [self.index.get(str(nick)) for nick in game['players']]
+            winner = self.index.get(str(game['nick']))
+            self.history_games += 1
+            stats = channel_stats.setdefault(game['channel'], [])
+            stats.append((game['score'], game['elapsed'], len(seats)))
+            if winner is None or None in seats or len(seats) < 2:
+                continue  # someone in this game has since been renamed or removed from the score table
+            losers = numpy.array([i for i in seats if i != winner])
+            # the winner beat every other player; spread K across those pairings so big tables don't swing harder
+            expected = 1.0 / (1.0 + 10 ** ((self.elo[losers] - self.elo[winner]) / 400.0))
+            delta = self.ELO_K / len(losers) * (1.0 - expected)
+            self.elo[winner] += delta.sum()
+            self.elo[losers] -= delta
+        for channel, stats in channel_stats.items():
+            stats = numpy.array(stats, dtype=numpy.float64)
+            self.channels[channel] = {
+                'games': len(stats),
+                'score': stats[:, 0].mean(),
+                'elapsed': stats[:, 1].mean(),
+                'players': stats[:, 2].mean(),
+            }
+
+    def percentiles(self, column):
+        if not len(column):
+            return [0.0] * len(self.PERCENTILES)
+        return numpy.percentile(column, self.PERCENTILES)
+
+    def summary_lines(self, top=5):
+        if not self.nicks:
+            return [STRINGS['NO_SCORES']]
+        labels = '/'.join('p%d' % p for p in self.PERCENTILES)
+        lines = ["%d ranked players, %d logged games. %s points: %s; pts/game: %s; win rate: %s" % (
+            len(self.nicks), self.history_games, labels,
+            ' '.join('%.0f' % v for v in self.percentiles(self.points)),
+            ' '.join('%.1f' % v for v in self.percentiles(self.pts_per_game)),
+            ' '.join('%.0f%%' % (v * 100) for v in self.percentiles(self.win_rate)))]
+        if self.history_games:
+            best = numpy.argsort(-self.elo, kind='stable')[:top]
+            lines.append("Top Elo: " + ', '.join('%s %.0f' % (self.nicks[i], self.elo[i]) for i in best))
+        if self.channels:
+            busiest = sorted(self.channels.items(), key=lambda item: item[1]['games'], reverse=YES)[:top]
+            lines.append("Channels: " + ', '.join(
+                '%s %d games (avg %.0f pts, %.1f players, %s)' % (
+                    channel, c['games'], c['score'], c['players'], timedelta(seconds=int(c['elapsed'])))
+                for channel, c in busiest))
+        return lines
+
+    def player_line(self, nick):
+        i = self.index.get(str(nick))
+        if i is None:
+            return STRINGS['NOT_RANKED'] % nick
+        line = "%s: rank #%d (top %.0f%% by points), win rate %.0f%% (95%% CI %.0f-%.0f%%), %.1f pts/game" % (
+            nick, self.rank[i], 100.0 * self.rank[i] / len(self.nicks), self.win_rate[i] * 100,
+            self.win_low[i] * 100, self.win_high[i] * 100, self.pts_per_game[i])
+        if self.history_games:
+            line += ", Elo %.0f" % self.elo[i]
+        return line
+
+
+def game_result(events):
+    """
+    The 'win' event of one game's event stream, tagged with the channel the game ended in; None if nobody won.
+    """
+    channel = None
+    for event in events:
+        if event['ev'] == 'start' or event['ev'] == 'move':
+            channel = event['channel']
+        elif event['ev'] == 'win' and 'players' in event:
+            event['channel'] = channel
+            return event
+    return None
+
+
+def iter_game_history(logdir):
+    """
+    Yield the final 'win' event of every finished game in the event logs and the monthly history files, oldest
+    first, tagged with the channel it ended in.
+    """
+    for game in GameHistory(logdir).games():
+        yield game
+
+
+class GameHistory(object):
+    """
+    The finished games in an event log directory, as iter_game_history() yields them. Each file is parsed once and
+    remembered by name; later calls only read logs that are new or have been written to since.
+    """
+    def __init__(self, logdir):
+        self.logdir = logdir
+        self._lock = threading.Lock()
+        self._files = {}  # name -> (file_stamp, results)
+
+    def games(self):
+        if not self.logdir or not os.path.isdir(self.logdir):
+            return []
+        with self._lock:
+            files = {}
+            for name in os.listdir(self.logdir):
+                if not name.endswith('.jsonl'):
+                    continue
+                path = os.path.join(self.logdir, name)
+                stamp = file_stamp(path)
+                cached = self._files.get(name)
+                if cached is None or cached[0] != stamp:
+                    try:
+                        cached = (stamp, self.read(path, name))
+                    except (IOError, OSError, ValueError):
+                        continue  # pruned since listdir(), or caught mid-write; try again next time
+                files[name] = cached
+            self._files = files
+        games = [game for _, results in files.values() for game in results]
+        games.sort(key=lambda event: event['ts'])
+        return games
+
+    @staticmethod
+    def read(path, name):
+        events = list(read_game_log(path))
+        if name.startswith('history-'):
+            return events
+        result = game_result(events)
+        return [result] if result is not None else []
+
+
+# players per tournament table, unless the organizer asks for something else
+TOURNEY_TABLE_SIZE = 4
+# the announcement scheduler sends at most one line per this many seconds, across all tables
+TOURNEY_LINE_INTERVAL = 1.0
+# lines a table may have waiting; past this its oldest are dropped, as they'd be stale by the time they went out
+TOURNEY_BACKLOG = 20
+
+
+class AnnouncementScheduler(object):
+    """
+    Sends the channel lines of every tournament table from a single thread. Tables take turns, so a busy table can't
+    crowd out the others, and each turn merges as many of that table's pending lines as fit into one IRC line.
+    """
+    def __init__(self, interval=TOURNEY_LINE_INTERVAL, backlog=TOURNEY_BACKLOG):
+        self.interval = interval
+        self.backlog = backlog
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # queue key -> [(bot, label, message, destination)], in turn order
+        self._thread = None
+        self._closed = NO
+        self._closing = threading.Event()  # cuts short the wait between lines
+
+    def put(self, key, bot, label, message, destination):
+        if isinstance(bot, TableBot):
+            bot = bot.bot
+        with self._cond:
+            queue = self._queues.setdefault(key, [])
+            queue.append((bot, label, message, destination))
+            if len(queue) > self.backlog:
+                del queue[0]
+                metrics.count('tourney.dropped')
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='UnoBot announcements')
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def close(self):
+        """
+        Send whatever is still queued, without waiting between lines, and stop the thread.
+        """
+        with self._cond:
+            self._closed = YES
+            self.interval = 0
+            self._closing.set()
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _next_line(self):
+        key, queue = next(iter(self._queues.items()))
+        del self._queues[key]
+        bot, label, message, destination = queue.pop(0)
+        text = message if label is None else STRINGS['TOURNEY_TABLE'] % (label, message)
+        while queue and queue[0][3] == destination and len(text) + len(queue[0][2]) + 3 <= NOTICE_LINE_BUDGET:
+            text += ' | ' + queue.pop(0)[2]
+        if queue:
+            self._queues[key] = queue  # back of the line
+        return bot, text, destination
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queues and not self._closed:
+                    self._cond.wait()
+                if not self._queues:
+                    return
+                bot, text, destination = self._next_line()
+            try:
+                bot.say(text, destination)
+            except Exception:
+                # this is the only thread sending tournament lines; losing one line beats silencing every table
+                LOGGER.exception('Error sending UNO tournament line to %s', destination)
+                metrics.count('tourney.errors')
+            else:
+                metrics.count('tourney.lines')
+            if self.interval:
+                self._closing.wait(self.interval)
+
+
+class TableBot(object):
+    """
+    What a tournament table's game is given in place of the bot: channel lines are queued with the announcement
+    scheduler, labelled with the table number, and everything else goes straight through to the bot. Games check
+    `throttled` to send what a player needs right away (their turn, replies to them) by notice instead.
+    """
+    __slots__ = ('bot', 'scheduler', 'key', 'label', 'channel')
+    throttled = YES
+
+    def __init__(self, bot, scheduler, key, label, channel):
+        self.bot = bot.bot if isinstance(bot, TableBot) else bot
+        self.scheduler = scheduler
+        self.key = key
+        self.label = label
+        self.channel = channel
+
+    def __getattr__(self, name):
+        return getattr(self.bot, name)
+
+    def say(self, message, destination=None):
+        self.scheduler.put(self.key, self.bot, self.label, message, destination or self.channel)
+
+
+class Tournament(object):
+    """
+    A knockout UNO tournament in one channel. Each round seats the remaining players at tables of up to `tableSize`,
+    which play at the same time as games in UnoBot.games under their own keys; each table's winner goes through to
+    the next round until one player is left.
+    """
+    __slots__ = ('channel', 'organizer', 'entrants', 'tableSize', 'round', 'tables', 'seats', 'advancing')
+
+    def __init__(self, channel, organizer):
+        self.channel = channel
+        self.organizer = organizer
+        self.entrants = []
+        self.tableSize = TOURNEY_TABLE_SIZE
+        self.round = 0
+        self.tables = {}  # key in UnoBot.games -> table number, for this round's tables still playing
+        self.seats = {}  # nick -> key of the table they're at, so their commands find their game in O(1)
+        self.advancing = []
+
+    def seat_round(self):
+        """
+        Start the next round: share this round's players out over as few tables as possible, with table sizes at
+        most one apart. Returns [(key, table number, nicks)] plus anyone who got a bye (a table of one).
+        """
+        players = list(self.advancing) if self.round else list(self.entrants)
+        system_random.shuffle(players)
+        self.advancing = []
+        self.round += 1
+        count = -(-len(players) // self.tableSize)
+        seated = []
+        byes = []
+        for n in range(count):
+            nicks = players[n::count]
+            if len(nicks) == 1:
+                byes.append(nicks[0])
+                self.advancing.append(nicks[0])
+                continue
+            key = tools.Identifier('%s/%d.%d' % (self.channel, self.round, n + 1))
+            self.tables[key] = n + 1
+            for nick in nicks:
+                self.seats[nick] = key
+            seated.append((key, n + 1, nicks))
+        return seated, byes
+
+    def nick_change(self, old, new):
+        if old in self.seats:
+            self.seats[new] = self.seats.pop(old)
+        if old in self.entrants:
+            self.entrants[self.entrants.index(old)] = new
+        if old in self.advancing:
+            self.advancing[self.advancing.index(old)] = new
+        if self.organizer == old:
+            self.organizer = new
+
+
 class UnoBot:
-    def __init__(self, scorefile):
+    def __init__(self, scorefile, logdir=None, boardfile=None):
         self.special_scores = {'R': 20, 'S': 20, 'D2': 20, 'WD4': 50, 'W': 50}
         self.scoreFile = scorefile
+        self.boards = Leaderboards(boardfile)
         self.games = {}
+        self.tournaments = {}  # channel -> Tournament
+        self.tables = {}  # key in self.games -> Tournament, for games that are tournament tables
+        self.announcer = AnnouncementScheduler()
+        self.log = GameLog(logdir) if logdir else None
+        self.logdir = logdir
+        self._analytics = (None, None)
+        self.history = GameHistory(logdir)
+        # score file writes have their own lock, so score I/O never holds up game-play; it also keeps other bot
+        # processes sharing the homedir from writing at the same time
+        self.scoreLock = ScoreFileLock(scorefile + '.lock')
+        self.scoreWriter = ScoreWriter(self)
+        self.renderCache = RenderCache()
+        self.renderStamp = self.render_stamp()  # score and board file versions the cached output was rendered from
+        metrics.gauges['render_cache_entries'] = self.renderCache.__len__
+        metrics.gauges['render_cache_hits'] = lambda: self.renderCache.hits
+        metrics.gauges['render_cache_misses'] = lambda: self.renderCache.misses
+        metrics.gauges['render_cache_hit_pct'] = self.renderCache.hit_rate
+        self.ai = UnoAI()
+
+    def close(self):
+        self.announcer.close()
+        self.scoreWriter.close()
+        if self.log:
+            self.log.stop()
 
     def start(self, bot, trigger):
-        if trigger.sender in self.games:
-            self.join(bot, trigger)
-        else:
-            self.games[trigger.sender] = UnoGame(trigger)
-            bot.say(STRINGS['GAME_STARTED'] % self.games[trigger.sender].owner)
+        with lock:
+            if trigger.sender in self.games:
+                self.join(bot, trigger)
+            else:
+                self.games[trigger.sender] = UnoGame(trigger, self.log)
+                bot.say(STRINGS['GAME_STARTED'] % self.games[trigger.sender].owner)
 
     def stop(self, bot, trigger, forced=NO):
-        chan = tools.Identifier(trigger.group(3) or trigger.sender)
-        if chan not in self.games:
-            bot.notice(STRINGS['NOT_STARTED'], trigger.nick)
-            return
-        game = self.games[chan]
-        if trigger.nick == game.owner or trigger.admin or forced:
-            if not forced:
-                bot.say(STRINGS['GAME_STOPPED'])
-                if trigger.sender != chan:
-                    bot.say(STRINGS['REMOTE_STOP'] % (trigger.sender, trigger.nick), chan)
-            del self.games[chan]
-        else:
-            bot.say(STRINGS['CANT_STOP'] % game.owner)
+        with lock:
+            if trigger.group(3) and not forced:
+                chan = tools.Identifier(trigger.group(3))
+            else:
+                chan = self.game_key(trigger)
+            if chan not in self.games:
+                bot.notice(STRINGS['NOT_STARTED'], trigger.nick)
+                return
+            game = self.games[chan]
+            if chan in self.tables and not forced:
+                # a table's owner is just whoever was seated first, so only the organizer can close it early
+                if not self.table_admin(trigger, chan):
+                    UnoGame.tell(self.game_bot(bot, chan), STRINGS['TOURNEY_CANT'] % self.tables[chan].organizer,
+                                 trigger.nick)
+                    return
+                self.game_bot(bot, chan).say(STRINGS['GAME_STOPPED'])
+                self.drop_game(bot, chan, trigger.nick)
+            elif trigger.nick == game.owner or trigger.admin or forced:
+                if not forced:
+                    bot.say(STRINGS['GAME_STOPPED'])
+                    if trigger.sender != game.channel:
+                        bot.say(STRINGS['REMOTE_STOP'] % (trigger.sender, trigger.nick), game.channel)
+                self.drop_game(bot, chan, trigger.nick)
+            else:
+                bot.say(STRINGS['CANT_STOP'] % game.owner)
+
+    def drop_game(self, bot, key, by):
+        with lock:
+            game = self.games.pop(key)
+            game.record('stop', by=by)
+            if self.log:
+                self.log.close(game)
+            if key in self.tables:  # whoever is left at the table gets through on a walkover
+                self.table_done(bot, key, game, game.playerOrder[0] if len(game.players) == 1 else None)
+
+    def game_key(self, trigger):
+        """
+        Where the game `trigger` is about lives in self.games: under the channel, unless the sender is seated at one of
+        the channel's tournament tables.
+        """
+        tourney = self.tournaments.get(trigger.sender)
+        if tourney is not None:
+            return tourney.seats.get(trigger.nick, trigger.sender)
+        return trigger.sender
+
+    def table_admin(self, trigger, key):
+        """
+        Whether `trigger` may kick from or stop the tournament table `key`: the organizer and bot admins can, and a
+        table's owner has no say beyond the other players.
+        """
+        return trigger.admin or trigger.nick == self.tables[key].organizer
+
+    def game_bot(self, bot, key):
+        tourney = self.tables.get(key)
+        if tourney is None:
+            return bot
+        return TableBot(bot, self.announcer, key, tourney.tables[key], tourney.channel)
 
     def join(self, bot, trigger):
-        if trigger.sender in self.games:
-            self.games[trigger.sender].join(bot, trigger)
-        else:
-            bot.say(STRINGS['NOT_STARTED'])
+        with lock:
+            if trigger.sender in self.games:
+                self.games[trigger.sender].join(bot, trigger)
+            else:
+                bot.say(STRINGS['NOT_STARTED'])
 
-    def quit(self, bot, trigger):
-        if trigger.sender in self.games:
+    def add_ai(self, bot, trigger):
+        with lock:
+            if trigger.sender not in self.games:
+                bot.say(STRINGS['NOT_STARTED'])
+                return
             game = self.games[trigger.sender]
-            if game.quit(bot, trigger) == STOP:
+            game.join(bot, trigger, bot.nick)
+            if bot.nick in game.players:
+                game.aiPlayers.add(bot.nick)
+        self.ai_turns(bot, trigger.sender)
+
+    def quit(self, bot, trigger):
+        with lock:
+            key = self.game_key(trigger)
+            if key not in self.games:
+                return
+            bot = self.game_bot(bot, key)
+            if self.games[key].quit(bot, trigger) == STOP:
                 bot.say(STRINGS['CANT_CONTINUE'])
                 self.stop(bot, trigger, forced=YES)
+                return
+        self.ai_turns(bot, key)
 
     def kick(self, bot, trigger):
-        if trigger.sender in self.games:
-            game = self.games[trigger.sender]
-            if game.kick(bot, trigger) == STOP:
+        with lock:
+            key = self.game_key(trigger)
+            tourney = self.tournaments.get(trigger.sender)
+            if tourney is not None and trigger.group(3):
+                # go by the victim's table: the organizer or an admin kicking someone needn't be seated anywhere
+                key = tourney.seats.get(tools.Identifier(trigger.group(3)), key)
+            if key not in self.games:
+                return
+            bot = self.game_bot(bot, key)
+            if key in self.tables and not self.table_admin(trigger, key):
+                # the table's owner would otherwise kick everyone else and go through on a walkover
+                UnoGame.tell(bot, STRINGS['TOURNEY_CANT'] % self.tables[key].organizer, trigger.nick)
+                return
+            if self.games[key].kick(bot, trigger, key in self.tables) == STOP:
                 bot.say(STRINGS['CANT_CONTINUE'])
-                self.stop(bot, trigger, forced=YES)
+                self.drop_game(bot, key, trigger.nick)
+                return
+        self.ai_turns(bot, key)
 
     def deal(self, bot, trigger):
-        if trigger.sender not in self.games:
-            bot.say(STRINGS['NOT_STARTED'])
-            return
-        self.games[trigger.sender].deal(bot, trigger)
+        with lock:
+            key = self.game_key(trigger)
+            if key not in self.games:
+                bot.say(STRINGS['NOT_STARTED'])
+                return
+            bot = self.game_bot(bot, key)
+            self.games[key].deal(bot, trigger)
+        self.ai_turns(bot, key)
 
     def play(self, bot, trigger):
-        if trigger.sender not in self.games:
-            return
-        game = self.games[trigger.sender]
-        winner = game.currentPlayer
-        if game.play(bot, trigger) == WIN:
-            winner = game.playerOrder[winner]
-            game_duration = datetime.now() - game.startTime
-            hours, remainder = divmod(game_duration.seconds, 3600)
-            minutes, seconds = divmod(remainder, 60)
-            game_duration = '%.2d:%.2d:%.2d' % (hours, minutes, seconds)
-            bot.say(STRINGS['WIN'] % (winner, game_duration))
-            self.game_ended(bot, trigger, winner)
+        with lock:
+            key = self.game_key(trigger)
+            if key not in self.games:
+                return
+            game = self.games[key]
+            bot = self.game_bot(bot, key)
+            winner = game.currentPlayer
+            if game.play(bot, trigger) == WIN:
+                self.game_won(bot, key, game.playerOrder[winner])
+                return
+        self.ai_turns(bot, key)
 
     def draw(self, bot, trigger):
-        if trigger.sender not in self.games:
-            return
-        game = self.games[trigger.sender]
-        game.draw(bot, trigger)
+        with lock:
+            key = self.game_key(trigger)
+            if key not in self.games:
+                return
+            game = self.games[key]
+            game.draw(self.game_bot(bot, key), trigger)
 
     def pass_(self, bot, trigger):
-        if trigger.sender not in self.games:
-            return
-        game = self.games[trigger.sender]
-        game.pass_(bot, trigger)
+        with lock:
+            key = self.game_key(trigger)
+            if key not in self.games:
+                return
+            game = self.games[key]
+            bot = self.game_bot(bot, key)
+            game.pass_(bot, trigger)
+        self.ai_turns(bot, key)
 
     def fml(self, bot, trigger):
-        if trigger.sender not in self.games:
-            return
-        self.games[trigger.sender].fml(bot, trigger)
+        with lock:
+            key = self.game_key(trigger)
+            if key not in self.games:
+                return
+            bot = self.game_bot(bot, key)
+            self.games[key].fml(bot, trigger)
+        self.ai_turns(bot, key)
+
+    def ai_turns(self, bot, key):
+        """
+        Play for the AI in the game under `key` for as long as it's on turn. Its moves go through the same UnoGame
+        methods (and event log) as everyone else's; only picking them happens outside the lock.
+        """
+        for i in range(AI_MAX_TURNS):
+            with lock:
+                game = self.games.get(key)
+                if game is None or not game.deck:
+                    return
+                nick = game.playerOrder[game.currentPlayer]
+                if nick not in game.aiPlayers:
+                    return
+                plays = game.legal_plays()
+                if not plays:
+                    game.fml(bot, BotTrigger(nick, game.channel))
+                    continue
+            searchcard, playcard = self.ai.choose(game, plays)
+            with lock:
+                if self.games.get(key) is not game:  # stopped or won while we were thinking
+                    return
+                if game.play(bot, BotTrigger(nick, game.channel, [playcard[0], playcard[1:]])) == WIN:
+                    self.game_won(bot, key, nick)
+                    return
+
+    def game_won(self, bot, key, winner):
+        game = self.games[key]
+        game_duration = datetime.now() - game.startTime
+        hours, remainder = divmod(game_duration.seconds, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        game_duration = '%.2d:%.2d:%.2d' % (hours, minutes, seconds)
+        bot.say(STRINGS['WIN'] % (winner, game_duration))
+        self.game_ended(bot, key, winner)
 
     def send_cards(self, bot, trigger):
-        if trigger.sender not in self.games:
-            return
-        game = self.games[trigger.sender]
-        game.send_cards(bot, trigger.nick)
+        with lock:
+            key = self.game_key(trigger)
+            if key not in self.games:
+                return
+            game = self.games[key]
+            game.send_cards(bot, trigger.nick)
 
     def send_counts(self, bot, trigger):
-        if trigger.sender not in self.games:
-            return
-        game = self.games[trigger.sender]
-        game.send_counts(bot)
+        with lock:
+            key = self.game_key(trigger)
+            if key not in self.games:
+                return
+            game = self.games[key]
+            game.send_counts(self.game_bot(bot, key), trigger.nick)
+
+    def tourney(self, bot, trigger):
+        args = (trigger.group(2) or '').split()
+        action = args[0].lower() if args else ''
+        chan = trigger.sender
+        p = bot.config.core.help_prefix
+        with lock:
+            tourney = self.tournaments.get(chan)
+            if action == 'open':
+                if tourney is not None:
+                    bot.say(STRINGS['TOURNEY_RUNNING'] % chan)
+                    return
+                self.tournaments[chan] = Tournament(chan, trigger.nick)
+                bot.say(STRINGS['TOURNEY_OPEN'].replace('%p', p) % trigger.nick)
+                return
+            if tourney is None:
+                bot.say(STRINGS['TOURNEY_NONE'].replace('%p', p))
+                return
+            if action in ('add', 'go', 'stop') and trigger.nick != tourney.organizer and not trigger.admin:
+                bot.say(STRINGS['TOURNEY_CANT'] % tourney.organizer)
+                return
+            if action in ('join', 'leave', 'add') and tourney.round:
+                bot.say(STRINGS['TOURNEY_STARTED'])
+                return
+            if action == 'join' or action == 'add':
+                nicks = [trigger.nick] if action == 'join' else [tools.Identifier(nick) for nick in args[1:]]
+                nicks = [nick for nick in nicks if nick not in tourney.entrants]
+                tourney.entrants.extend(nicks)
+                if nicks:
+                    bot.say(STRINGS['TOURNEY_ENTERED'] % (', '.join(nicks), len(tourney.entrants)))
+            elif action == 'leave':
+                if trigger.nick not in tourney.entrants:
+                    return
+                tourney.entrants.remove(trigger.nick)
+                bot.say(STRINGS['TOURNEY_LEFT'] % (trigger.nick, len(tourney.entrants)))
+            elif action == 'go':
+                if tourney.round:
+                    bot.say(STRINGS['TOURNEY_STARTED'])
+                    return
+                if len(args) > 1:
+                    try:
+                        tourney.tableSize = max(2, int(args[1]))
+                    except ValueError:
+                        bot.say(STRINGS['TOURNEY_SYNTAX'].replace('%p', p))
+                        return
+                if len(tourney.entrants) < 2:
+                    bot.say(STRINGS['TOURNEY_NOT_ENOUGH'])
+                    return
+                self.next_round(bot, tourney)
+            elif action == 'stop':
+                for key in list(tourney.tables):
+                    game = self.games.pop(key)
+                    game.record('stop', by=trigger.nick)
+                    if self.log:
+                        self.log.close(game)
+                    del self.tables[key]
+                del self.tournaments[chan]
+                bot.say(STRINGS['TOURNEY_STOPPED'])
+            elif not action:
+                if tourney.round:
+                    bot.say(STRINGS['TOURNEY_STATUS'] % (tourney.round, len(tourney.tables), len(tourney.advancing)))
+                else:
+                    bot.say(STRINGS['TOURNEY_ENTRIES'] % (len(tourney.entrants), ', '.join(tourney.entrants) or '-'))
+            else:
+                bot.say(STRINGS['TOURNEY_SYNTAX'].replace('%p', p))
+
+    def next_round(self, bot, tourney):
+        """
+        Seat and deal the next round, or crown the champion if only one player is left.
+        """
+        with lock:
+            if len(tourney.advancing) < 2 and tourney.round:
+                del self.tournaments[tourney.channel]
+                if tourney.advancing:
+                    self.announcer.put(tourney.channel, bot, None, STRINGS['TOURNEY_CHAMPION'] % tourney.advancing[0],
+                                       tourney.channel)
+                else:  # every table of the last round was stopped or emptied
+                    self.announcer.put(tourney.channel, bot, None, STRINGS['TOURNEY_NO_CHAMPION'], tourney.channel)
+                return
+            seated, byes = tourney.seat_round()
+            self.announcer.put(tourney.channel, bot, None, STRINGS['TOURNEY_ROUND'] % (
+                tourney.round, sum(len(nicks) for key, n, nicks in seated), len(seated),
+                'table' if len(seated) == 1 else 'tables'), tourney.channel)
+            for nick in byes:
+                self.announcer.put(tourney.channel, bot, None, STRINGS['TOURNEY_BYE'] % nick, tourney.channel)
+            for key, n, nicks in seated:
+                game = self.games[key] = UnoGame(BotTrigger(nicks[0], tourney.channel), self.log)
+                self.tables[key] = tourney
+                out = self.game_bot(bot, key)
+                out.say(STRINGS['TOURNEY_SEATED'] % ', '.join(nicks))
+                for nick in nicks[1:]:  # seated rather than join()ed, so the table isn't announced once per player
+                    game.players[nick] = []
+                    game.playerOrder.append(nick)
+                    game.record('join', nick=nick)
+                game.deal(out, BotTrigger(nicks[0], tourney.channel))
+            if not seated:  # everyone had a bye, i.e. one player was left
+                self.next_round(bot, tourney)
+
+    def table_done(self, bot, key, game, winner):
+        """
+        A tournament table's game is over: put its winner (if any) through, and start the next round once it was the
+        last table still playing.
+        """
+        with lock:
+            tourney = self.tables.pop(key)
+            n = tourney.tables.pop(key)
+            for nick in list(game.players) + list(game.deadPlayers):
+                if tourney.seats.get(nick) == key:
+                    del tourney.seats[nick]
+            out = TableBot(bot, self.announcer, key, n, tourney.channel)
+            if winner is None:
+                out.say(STRINGS['TOURNEY_NO_WINNER'])
+            else:
+                tourney.advancing.append(winner)
+                out.say(STRINGS['TOURNEY_ADVANCES'] % (winner, tourney.round + 1))
+            if not tourney.tables and self.tournaments.get(tourney.channel) is tourney:
+                self.next_round(bot, tourney)
 
     def rankings(self, bot, trigger, toplist=NO):
-        scores = self.get_scores(bot)
+        window, channel, player = 'all', None, None
+        for arg in (trigger.group(2) or '').split():
+            if arg.lower() in Leaderboards.WINDOWS:
+                window = arg.lower()
+            elif arg[0] in '#&':
+                channel = tools.Identifier(arg)
+            else:
+                player = arg
+        if toplist:
+            player = None  # .unotop only lists the board; a stray nick (or a number) isn't a rank request
+        else:
+            player = str(player or trigger.nick)
+        stamp = self.render_stamp()
+        if stamp != self.renderStamp:  # changed by something other than update_scores(), e.g. an import
+            self.renderCache.clear()
+            self.renderStamp = stamp
+        board = RenderCache.board((window, Leaderboards.period(window, datetime.now()),
+                                   channel or Leaderboards.ALL_SCOPES))
+        key = ('top', board, None) if toplist else ('rank', board, player)
+        entry = self.renderCache.get(key)
+        if entry is None:
+            generation = self.renderCache.generation
+            entry = self.render_rankings(bot, window, channel, player, toplist)
+            if entry is None:
+                bot.say(STRINGS['NO_SCORES'])
+                return
+            self.renderCache.put(key, entry, generation)
+        for line in entry[0]:
+            bot.say(line)
+
+    def render_rankings(self, bot, window, channel, player=None, toplist=NO):
+        """
+        The lines .unotop (`toplist`) or .unorank (`player`'s rank) shows for a board, in the form RenderCache stores
+        them; None if the board is empty.
+        """
+        board = None
+        if window == 'all' and not channel:
+            scores = self.get_scores(bot)
+        else:
+            # named as the board is stored, so the output (and its cached copy) is the same for any spelling
+            board = Leaderboards.describe(window, Leaderboards.scope(channel) if channel else None)
+            scores = self.boards.table(window, channel)
         if not scores:
-            bot.say(STRINGS['NO_SCORES'])
-            return
-        order = sorted(scores.keys(), key=lambda k: scores[k]['points'], reverse=YES)
+            return None
+        order = sorted(scores.keys(), key=lambda k: scores[k].points, reverse=YES)
+        lines = []
         if toplist:
-            i = 1
-            for player in order[:5]:
-                if not scores[player]['points']:
+            if board:
+                lines.append(STRINGS['BOARD_TOP'] % board)
+            shown = set()
+            for i, player in enumerate(order[:5], 1):
+                record = scores[player]
+                if not record.points:
                     break  # nobody else has any points; stop printing
-                g_points = "point" if scores[player]['points'] == 1 else "points"
-                g_games = "game" if scores[player]['games'] == 1 else "games"
+                g_points = "point" if record.points == 1 else "points"
+                g_games = "game" if record.games == 1 else "games"
                 ptsperwin = 0.0
-                if scores[player]['wins']:
-                    ptsperwin = scores[player]['points'] / float(scores[player]['wins'])
-                bot.say(STRINGS['SCORE_ROW'] %
-                        (i, player, scores[player]['points'], g_points, scores[player]['games'], g_games,
-                         scores[player]['wins'], timedelta(seconds=int(scores[player]['playtime'])),
-                         scores[player]['points'] / float(scores[player]['playtime']),
-                         scores[player]['points'] / float(scores[player]['games']),
-                         ptsperwin))
-                i += 1
+                if record.wins:
+                    ptsperwin = record.points / float(record.wins)
+                lines.append(STRINGS['SCORE_ROW'] %
+                             (i, player, record.points, g_points, record.games, g_games,
+                              record.wins, timedelta(seconds=int(record.playtime)),
+                              record.points / float(record.playtime or 1),
+                              record.points / float(record.games),
+                              ptsperwin))
+                shown.add(player)
+            # with a full list, a winner has to reach the last row to get on it; otherwise any score can
+            lowest = scores[order[4]].points if len(shown) == 5 else 0
+            return lines, shown, lowest
+        try:
+            rank = order.index(player) + 1
+        except ValueError:
+            if board:
+                lines.append(STRINGS['BOARD_NOT_RANKED'] % (player, board))
+            else:
+                lines.append(STRINGS['NOT_RANKED'] % player)
+            return lines, None
+        points = scores[player].points
+        g_points = "point" if points == 1 else "points"
+        wins = scores[player].wins
+        g_wins = "victory" if wins == 1 else "victories"
+        if board:
+            lines.append(STRINGS['BOARD_RANK'] % (player, rank, board, points, g_points, wins, g_wins))
         else:
-            player = str(trigger.group(3) or trigger.nick)
-            try:
-                rank = order.index(player) + 1
-            except ValueError:
-                bot.say(STRINGS['NOT_RANKED'] % player)
-                return
-            points = scores[player]['points']
-            g_points = "point" if points == 1 else "points"
-            wins = scores[player]['wins']
-            g_wins = "victory" if wins == 1 else "victories"
-            bot.say(STRINGS['YOUR_RANK'] % (player, rank, points, g_points, wins, g_wins))
+            lines.append(STRINGS['YOUR_RANK'] % (player, rank, points, g_points, wins, g_wins))
+        return lines, points
 
-    def game_ended(self, bot, trigger, winner):
+    def render_stamp(self):
+        return file_stamp(self.scoreFile), file_stamp(self.boards.path) if self.boards.path else None
+
+    def game_ended(self, bot, key, winner):
         with lock:
-            game = self.games[trigger.sender]
+            game = self.games[key]
             try:
                 score = 0
                 for p in game.players:
@@ -725,76 +2625,110 @@ class UnoBot:
                         else:
                             score += int(c[1])
                 elapsed = (datetime.now() - game.startTime).seconds
+                game.record('win', nick=winner, score=score, elapsed=elapsed, ts=int(time.time()),
+                            players=list(game.players))
                 bot.say(STRINGS['GAINS'] % (winner, score, 'point' if score == 1 else 'points',
-                    score / float(elapsed)))
-                self.update_scores(bot, game.players.keys(), winner, score, elapsed)
+                    score / float(max(elapsed, 1))))
+                self.scoreWriter.submit(bot, list(game.players.keys()), winner, score, elapsed, game.channel)
             except Exception as e:
                 bot.say("UNO score error: %s" % e)
-            del self.games[trigger.sender]
-
-    def update_scores(self, bot, players, winner, score, time):
-        with lock:
+            if self.log:
+                self.log.close(game)
+            del self.games[key]
+            if key in self.tables:
+                self.table_done(bot, key, game, winner)
+
+    def update_scores(self, bot, players, winner, score, time, channel=None):
+        with self.scoreLock:
+            stamp = self.render_stamp()
             scores = self.get_scores(bot)
             winner = str(winner)
+            players = [str(pl) for pl in players]
+            old = scores[winner].points if winner in scores else 0
             for pl in players:
-                pl = str(pl)
                 if pl not in scores:
-                    scores[pl] = {'games': 0, 'wins': 0, 'points': 0, 'playtime': 0}
-                scores[pl]['games'] += 1
-                scores[pl]['playtime'] += time
-            scores[winner]['wins'] += 1
-            scores[winner]['points'] += score
+                    scores[pl] = ScoreRecord()
+                scores[pl].games += 1
+                scores[pl].playtime += time
+            scores[winner].wins += 1
+            scores[winner].points += score
+            start = timer()
             try:
-                with open(self.scoreFile, 'w+') as scorefile:
-                    json.dump(scores, scorefile)
+                write_score_file(self.scoreFile, scores.items())
             except Exception as e:
                 bot.say("Error saving UNO score file: %s" % e)
+            when = datetime.now()
+            channel = str(channel) if channel else None
+            self.boards.refresh()
+            before = [(key, self.boards.points(key, winner)) for key in self.boards.keys(channel, when)]
+            self.boards.add_game(channel, players, winner, score, time, when)
+            try:
+                self.boards.save()
+            except Exception as e:
+                bot.say("Error saving UNO leaderboards: %s" % e)
+            metrics.observe('score_write', timer() - start)
+            played = set(players)
+            self.renderCache.invalidate(('all', 'all', Leaderboards.ALL_SCOPES), played, old, old + score)
+            for key, points in before:
+                self.renderCache.invalidate(RenderCache.board(key), played, points, points + score)
+            if stamp == self.renderStamp:  # else someone else wrote in between; rankings() will notice and start over
+                self.renderStamp = self.render_stamp()
 
     def get_scores(self, bot):
+        # no lock needed to read: the score file is only ever replaced whole, never rewritten in place
         scores = {}
-        with lock:
+        start = timer()
+        try:
             try:
-                with open(self.scoreFile, 'r+') as scorefile:
-                    scores = json.load(scorefile)
+                with open(self.scoreFile, 'r') as scorefile:
+                    scores = ScoreRecord.load_table(json.load(scorefile))
             except ValueError:
-                try:
-                    self.convert_score_file(bot)
-                    return self.get_scores(bot)
-                except ValueError:
-                    bot.say("Something has gone horribly wrong with the UNO scores. Please submit an issue on GitHub.")
-            except IOError as e:
-                bot.say("Error opening UNO scores: %s" % e)
+                if not self.convert_score_file(bot):
+                    return scores
+                with open(self.scoreFile, 'r') as scorefile:
+                    scores = ScoreRecord.load_table(json.load(scorefile))
+            metrics.observe('score_read', timer() - start)
+        except ValueError:
+            bot.say("Something has gone horribly wrong with the UNO scores. Please submit an issue on GitHub.")
+        except IOError as e:
+            bot.say("Error opening UNO scores: %s" % e)
         return scores
 
     def convert_score_file(self, bot):
-        scores = {}
-        with lock:
+        with self.scoreLock:
+            with open(self.scoreFile) as scorefile:
+                if scorefile.read(64).lstrip()[:1] == '{':
+                    return YES  # another process converted it while we waited for the lock
             try:
-                with open(self.scoreFile, 'r+') as scorefile:
-                    for line in scorefile:
-                        tokens = line.replace('\n', '').split(' ')
-                        if len(tokens) < 4:
-                            continue
-                        if len(tokens) == 4:
-                            tokens.append(0)
-                        scores[tools.Identifier(tokens[0])] = {
-                            'games':    int(tokens[1]),
-                            'wins':     int(tokens[2]),
-                            'points':   int(tokens[3]),
-                            'playtime': int(tokens[4]),
-                        }
+                write_score_file(self.scoreFile, iter_legacy_score_file(self.scoreFile))
             except Exception as e:
                 bot.say("Score conversion error: %s" % e)
-                return
-            else:
-                bot.say("Converted UNO score file to new JSON format.")
-            try:
-                with open(self.scoreFile, 'w+') as scorefile:
-                    json.dump(scores, scorefile)
-            except Exception as e:
-                bot.say("Error converting UNO score file: %s" % e)
-            else:
-                bot.say("Wrote UNO score file in new JSON format.")
+                return NO
+            bot.say("Converted UNO score file to new JSON format.")
+            return YES
+
+    def analytics(self):
+        """
+        ScoreAnalytics for the current score file, recomputed only after it has been rewritten.
+        """
+        stamp = file_stamp(self.scoreFile)
+        cached_stamp, cached = self._analytics
+        if cached is None or stamp != cached_stamp:
+            cached = ScoreAnalytics(iter_score_export(self.scoreFile, 'json'), self.history.games())
+            self._analytics = (stamp, cached)
+        return cached
+
+    def export_scores(self, path, fmt=None):
+        return write_score_export(path, iter_score_export(self.scoreFile, 'json'), fmt)
+
+    def import_scores(self, path, fmt=None):
+        with self.scoreLock:
+            sources = [iter_score_export(path, fmt)]
+            if os.path.exists(self.scoreFile):
+                sources.insert(0, iter_score_export(self.scoreFile, 'json'))
+            merged = merge_score_entries(*sources)
+            write_score_file(self.scoreFile, merged)
+            return len(merged)
 
     @staticmethod
     def set_card_colors(bot, trigger):
@@ -840,9 +2774,35 @@ class UnoBot:
     def get_card_theme(bot, nick):
         return bot.db.get_nick_value(tools.Identifier(nick), 'uno_theme') or THEME_NONE
 
+    @staticmethod
+    def set_hand_mode(bot, trigger):
+        mode = trigger.group(3) or None
+        if not mode:
+            mode = UnoBot.get_hand_mode(bot, trigger.nick)
+            bot.notice(STRINGS['HAND_CURRENT'] % HAND_MODE_NAMES[mode], trigger.nick)
+            return
+        mode = mode.lower()
+        if mode not in HAND_MODES:
+            bot.notice(STRINGS['HAND_NEEDED'] % ', '.join(HAND_MODES.keys()), trigger.nick)
+            return
+        bot.db.set_nick_value(trigger.nick, 'uno_hand', HAND_MODES[mode])
+        if HAND_MODES[mode] == HAND_DELTA:
+            bot.notice(STRINGS['HAND_SET_DELTA'].replace('%p', bot.config.core.help_prefix), trigger.nick)
+        else:
+            bot.notice(STRINGS['HAND_SET_FULL'], trigger.nick)
+
+    @staticmethod
+    def get_hand_mode(bot, nick):
+        return bot.db.get_nick_value(tools.Identifier(nick), 'uno_hand') or HAND_FULL
+
     def nick_change(self, bot, trigger):
-        for game in self.games:
-            self.games[game].nick_change(bot, trigger)
+        with lock:
+            for key, game in list(self.games.items()):
+                if game.nick_change(bot, trigger) == STOP:
+                    bot.say(STRINGS['CANT_CONTINUE'], game.channel)
+                    self.drop_game(bot, key, trigger.nick)
+            for tourney in self.tournaments.values():
+                tourney.nick_change(trigger.nick, tools.Identifier(trigger))
 
     def move_game(self, bot, trigger):
         who = trigger.nick
@@ -850,39 +2810,40 @@ class UnoBot:
         newchan = tools.Identifier(trigger.group(3))
         if newchan[0] != '#':
             newchan = tools.Identifier('#' + newchan)
-        if oldchan not in self.games:
-            bot.reply(STRINGS['NOT_STARTED'])
-            return
-        owner = self.games[oldchan].owner
-        if not (trigger.admin or who == owner):
-            bot.reply(STRINGS['CANT_MOVE'] % owner)
-            return
-        if not newchan:
-            bot.reply(STRINGS['NEED_CHANNEL'])
-            return
-        if newchan == oldchan:
-            return
-        if newchan.lower() not in bot.privileges:
-            bot.reply(STRINGS['NOT_IN_CHANNEL'] % newchan)
-            return
-        if newchan in self.games:
-            bot.reply(STRINGS['CHANNEL_IN_USE'] % newchan)
-            return
-        game = self.games.pop(oldchan)
-        self.games[newchan] = game
-        game.game_moved(bot, who, oldchan, newchan)
-
-
-class InvalidCardError(ValueError):
-    pass
+        with lock:
+            if oldchan not in self.games:
+                bot.reply(STRINGS['NOT_STARTED'])
+                return
+            owner = self.games[oldchan].owner
+            if not (trigger.admin or who == owner):
+                bot.reply(STRINGS['CANT_MOVE'] % owner)
+                return
+            if not newchan:
+                bot.reply(STRINGS['NEED_CHANNEL'])
+                return
+            if newchan == oldchan:
+                return
+            if newchan.lower() not in bot.privileges:
+                bot.reply(STRINGS['NOT_IN_CHANNEL'] % newchan)
+                return
+            if newchan in self.games:
+                bot.reply(STRINGS['CHANNEL_IN_USE'] % newchan)
+                return
+            game = self.games.pop(oldchan)
+            self.games[newchan] = game
+            game.game_moved(bot, who, oldchan, newchan)
 
 
 # With all the scaffolding in place, we can set up the bot to play (finally)
 def setup(bot):
-    bot.memory['UnoBot'] = UnoBot(os.path.join(bot.config.core.homedir, 'unoscores.txt'))
+    bot.memory['UnoBot'] = UnoBot(os.path.join(bot.config.core.homedir, 'unoscores.txt'),
+                                  os.path.join(bot.config.core.homedir, 'unologs'),
+                                  os.path.join(bot.config.core.homedir, 'unoboards.json'))
+    bot.memory['UnoBot'].scoreWriter.resume(bot)
 
 
 def shutdown(bot):
+    bot.memory['UnoBot'].close()
     del bot.memory['UnoBot']
 
 
@@ -890,6 +2851,7 @@ def shutdown(bot):
 @module.example(".uno")
 @module.priority('high')
 @module.require_chanmsg
+@instrumented
 def unostart(bot, trigger):
     """
     Start UNO in the current channel.
@@ -901,6 +2863,7 @@ def unostart(bot, trigger):
 @module.example(".unostop")
 @module.priority('high')
 @module.require_chanmsg
+@instrumented
 def unostop(bot, trigger):
     """
     Stops an UNO game in progress.
@@ -911,6 +2874,7 @@ def unostop(bot, trigger):
 @module.rule('^join$')
 @module.priority('high')
 @module.require_chanmsg
+@instrumented
 def unojoin(bot, trigger):
     bot.memory['UnoBot'].join(bot, trigger)
 
@@ -918,6 +2882,7 @@ def unojoin(bot, trigger):
 @module.rule('^quit$')
 @module.priority('high')
 @module.require_chanmsg
+@instrumented
 def unoquit(bot, trigger):
     bot.memory['UnoBot'].quit(bot, trigger)
 
@@ -925,13 +2890,41 @@ def unoquit(bot, trigger):
 @module.commands('unokick')
 @module.priority('high')
 @module.require_chanmsg
+@instrumented
 def unokick(bot, trigger):
     bot.memory['UnoBot'].kick(bot, trigger)
 
 
+@module.commands('unoai')
+@module.example(".unoai")
+@module.priority('medium')
+@module.require_chanmsg
+@instrumented
+def unoai(bot, trigger):
+    """
+    Deals the bot itself into the UNO game in this channel as a computer player.
+    """
+    bot.memory['UnoBot'].add_ai(bot, trigger)
+
+
+@module.commands('unotourney')
+@module.example(".unotourney open")
+@module.example(".unotourney go 4")
+@module.priority('medium')
+@module.require_chanmsg
+@instrumented
+def unotourney(bot, trigger):
+    """
+    Runs a knockout UNO tournament at several tables in this channel: open, join, leave, add <nicks>, go [table
+    size], stop, or no argument for the standings.
+    """
+    bot.memory['UnoBot'].tourney(bot, trigger)
+
+
 @module.commands('deal')
 @module.priority('medium')
 @module.require_chanmsg
+@instrumented
 def unodeal(bot, trigger):
     bot.memory['UnoBot'].deal(bot, trigger)
 
@@ -939,18 +2932,21 @@ def unodeal(bot, trigger):
 @module.commands('play')
 @module.priority('medium')
 @module.require_chanmsg
+@instrumented
 def unoplay(bot, trigger):
     bot.memory['UnoBot'].play(bot, trigger)
 
 @module.rule('^[rgbyw][0-9rgbyds]{1,3}$')
 @module.priority('low')
 @module.require_chanmsg
+@instrumented
 def unoplayshort(bot, trigger):
     bot.memory['UnoBot'].play(bot, trigger)
 
 @module.commands('draw')
 @module.priority('medium')
 @module.require_chanmsg
+@instrumented
 def unodraw(bot, trigger):
     bot.memory['UnoBot'].draw(bot, trigger)
 
@@ -958,6 +2954,7 @@ def unodraw(bot, trigger):
 @module.commands('pass')
 @module.priority('medium')
 @module.require_chanmsg
+@instrumented
 def unopass(bot, trigger):
     bot.memory['UnoBot'].pass_(bot, trigger)
 
@@ -966,6 +2963,7 @@ def unopass(bot, trigger):
 @module.rule('fuck')
 @module.priority('medium')
 @module.require_chanmsg
+@instrumented
 def fml(bot, trigger):
     bot.memory['UnoBot'].fml(bot, trigger)
 
@@ -974,6 +2972,7 @@ def fml(bot, trigger):
 @module.example(".cards")
 @module.priority('medium')
 @module.require_chanmsg
+@instrumented
 def unocards(bot, trigger):
     """
     Retrieve your current UNO hand for the current channel's game.
@@ -985,6 +2984,7 @@ def unocards(bot, trigger):
 @module.example(".counts")
 @module.priority('medium')
 @module.require_chanmsg
+@instrumented
 def unocounts(bot, trigger):
     """
     Sends current UNO card counts to the channel, if a game is in progress.
@@ -995,6 +2995,7 @@ def unocounts(bot, trigger):
 @module.commands('unocolor', 'unocolour', 'unocolors', 'unocolours')
 @module.example(".unocolor off")
 @module.priority('low')
+@instrumented
 def unocolor(bot, trigger):
     """
     Set colored cards on or off. Disabling color will present cards in an alternate format.
@@ -1005,6 +3006,7 @@ def unocolor(bot, trigger):
 @module.commands('unotheme')
 @module.example(".unotheme dark")
 @module.priority('low')
+@instrumented
 def unotheme(bot, trigger):
     """
     Sets your UNO card theme to have a dark/light background. Clear your theme setting with "default".
@@ -1012,9 +3014,21 @@ def unotheme(bot, trigger):
     UnoBot.set_card_theme(bot, trigger)
 
 
+@module.commands('unohand')
+@module.example(".unohand delta")
+@module.priority('low')
+@instrumented
+def unohand(bot, trigger):
+    """
+    Choose whether your turn notice shows your whole hand ("full", the default) or only what changed ("delta").
+    """
+    UnoBot.set_hand_mode(bot, trigger)
+
+
 @module.commands('unohelp')
 @module.example(".unohelp")
 @module.priority('low')
+@instrumented
 def unohelp(bot, trigger):
     """
     Shows some basic help for UNO game-play.
@@ -1027,11 +3041,15 @@ def unohelp(bot, trigger):
 
 @module.commands('unotop')
 @module.example(".unotop")
+@module.example(".unotop weekly")
+@module.example(".unotop daily #uno")
 @module.priority('low')
-@module.rate(900)
+@module.rate(60)
+@instrumented
 def unotop(bot, trigger):
     """
-    Shows the top 5 players by score. Unlike most UNO commands, can be sent in a PM.
+    Shows the top 5 players by score, overall or for today/this week and optionally one channel. Unlike most UNO
+    commands, can be sent in a PM.
     """
     bot.memory['UnoBot'].rankings(bot, trigger, YES)
 
@@ -1039,10 +3057,13 @@ def unotop(bot, trigger):
 @module.commands('unorank')
 @module.example(".unorank")
 @module.example(".unorank UnoAddict")
+@module.example(".unorank UnoAddict weekly #uno")
 @module.priority('low')
+@instrumented
 def unorank(bot, trigger):
     """
-    Shows the ranking, by accumulated UNO points, of the calling player or the specified nick.
+    Shows the ranking, by accumulated UNO points, of the calling player or the specified nick. Add daily/weekly
+    and/or a channel to rank on that board instead.
     """
     bot.memory['UnoBot'].rankings(bot, trigger, NO)
 
@@ -1050,6 +3071,7 @@ def unorank(bot, trigger):
 @module.commands('unogames')
 @module.priority('high')
 @module.require_admin
+@instrumented
 def unogames(bot, trigger):
     chans = []
     active = 0
@@ -1073,9 +3095,141 @@ def unogames(bot, trigger):
         % (pending, g_pending, active, g_active, chanlist))
 
 
+@module.commands('unostats')
+@module.example('.unostats')
+@module.example('.unostats dump')
+@module.priority('low')
+@module.require_admin
+@instrumented
+def unostats(bot, trigger):
+    """
+    Shows per-command UNO latency percentiles, or with "dump" writes them to unostats.prom in the bot's homedir.
+    """
+    if (trigger.group(3) or '').lower() == 'dump':
+        path = os.path.join(bot.config.core.homedir, 'unostats.prom')
+        try:
+            with open(path, 'w') as statsfile:
+                statsfile.write(metrics.render_text())
+        except IOError as e:
+            bot.reply("Error writing UNO stats: %s" % e)
+            return
+        bot.reply("Wrote UNO stats to %s." % path)
+        return
+    lines = metrics.summary_lines()
+    if not lines:
+        bot.reply("No UNO stats recorded yet.")
+        return
+    for line in lines:
+        bot.notice(line, trigger.nick)
+
+
+@module.commands('unoprofile')
+@module.example('.unoprofile 100')
+@module.example('.unoprofile 60s')
+@module.example('.unoprofile stop')
+@module.priority('low')
+@module.require_admin
+@instrumented
+def unoprofile(bot, trigger):
+    """
+    Profiles the next N UNO command calls (or all calls for N seconds) and reports where the time went.
+    """
+    global profiling
+    arg = (trigger.group(3) or '').lower()
+    if arg == 'stop':
+        if profiling is None:
+            bot.reply("The UNO profiler isn't running.")
+        else:
+            profiling.finish()
+        return
+    if profiling is not None:
+        bot.reply("The UNO profiler is already running; use %sunoprofile stop first." % bot.config.core.help_prefix)
+        return
+    try:
+        if arg.endswith('s'):
+            session = ProfileSession(bot, trigger.sender, seconds=int(arg[:-1]))
+        else:
+            session = ProfileSession(bot, trigger.sender, calls=int(arg))
+    except ValueError:
+        bot.reply("Give a number of calls (e.g. 100) or seconds (e.g. 60s) to profile.")
+        return
+    profiling = session
+    bot.reply("Profiling UNO commands; results will be saved in %s." % session.path)
+
+
+@module.commands('unoanalytics')
+@module.example('.unoanalytics')
+@module.example('.unoanalytics UnoAddict')
+@module.priority('low')
+@module.require_admin
+@instrumented
+def unoanalytics(bot, trigger):
+    """
+    Shows score distribution percentiles, Elo ratings and per-channel statistics, or one player's detailed stats.
+    """
+    if numpy is None:
+        bot.reply("UNO analytics need NumPy, which isn't installed.")
+        return
+    try:
+        analytics = bot.memory['UnoBot'].analytics()
+    except Exception as e:
+        bot.reply("Error computing UNO analytics: %s" % e)
+        return
+    if trigger.group(3):
+        bot.notice(analytics.player_line(trigger.group(3)), trigger.nick)
+        return
+    for line in analytics.summary_lines():
+        bot.notice(line, trigger.nick)
+
+
+@module.commands('unoexport')
+@module.example('.unoexport csv')
+@module.priority('low')
+@module.require_admin
+@instrumented
+def unoexport(bot, trigger):
+    """
+    Exports UNO scores to unoscores-export.jsonl (or .csv) in the bot's homedir.
+    """
+    fmt = (trigger.group(3) or 'jsonl').lower()
+    if fmt not in ('jsonl', 'csv'):
+        bot.reply("Export format must be jsonl or csv.")
+        return
+    path = os.path.join(bot.config.core.homedir, 'unoscores-export.' + fmt)
+    try:
+        count = bot.memory['UnoBot'].export_scores(path, fmt)
+    except Exception as e:
+        bot.reply("Error exporting UNO scores: %s" % e)
+        return
+    bot.reply("Exported %d UNO score entries to %s." % (count, path))
+
+
+@module.commands('unoimport')
+@module.example('.unoimport otherbot-scores.csv')
+@module.priority('low')
+@module.require_admin
+@instrumented
+def unoimport(bot, trigger):
+    """
+    Merges UNO scores from a .jsonl/.csv export or another bot's score file (relative to the bot's homedir) into this
+    bot's scores, adding up games, wins, points and playtime per nick.
+    """
+    if not trigger.group(3):
+        bot.reply("I need the path of a score file or export to import.")
+        return
+    path = os.path.join(bot.config.core.homedir, os.path.expanduser(trigger.group(3)))
+    try:
+        count = bot.memory['UnoBot'].import_scores(path)
+    except Exception as e:
+        bot.reply("Error importing UNO scores: %s" % e)
+        return
+    bot.reply("Merged %s into the UNO scores; %d players are now ranked." % (path, count))
+
+
 @module.commands('unomove')
 @module.priority('high')
 @module.example('.unomove #anotherchannel')
+@instrumented
 def unomove(bot, trigger):
     """
     Lets the game owner or a bot admin move an UNO game from one channel to another,
@@ -1088,5 +3242,6 @@ def unomove(bot, trigger):
 @module.event('NICK')
 @module.rule('.*')
 @module.priority('high')
+@instrumented
 def uno_glue(bot, trigger):
     bot.memory['UnoBot'].nick_change(bot, trigger)